@@ -4,6 +4,18 @@ import pytesseract
 import os
 from glob import glob
 import math
+import time
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from template_bank import ORB_FEATURES, get_template_bank
+
+FOOTER_CROP_PX = 200  # coupe fixe du pied de page quand ORB n'est pas utilisé / ne trouve rien
+
+# Écritures des images de debug en tâche de fond
+_DEBUG_WRITER = None
+_DEBUG_PENDING = []
 
 def check_homography_valid(M):
 	det = np.linalg.det(M)
@@ -24,9 +36,42 @@ def check_homography_valid(M):
 
 	return img_gray
 
-def crop_footer_with_orb(img, tpl, min_match_count=10, search_factor=2):
-	img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-	tpl_gray = cv2.cvtColor(tpl, cv2.COLOR_BGR2GRAY)
+def _debug_writer():
+	global _DEBUG_WRITER
+	if _DEBUG_WRITER is None:
+		_DEBUG_WRITER = ThreadPoolExecutor(max_workers=1)
+	return _DEBUG_WRITER
+
+def write_debug_image(path, img):
+	"""Écrit une image de debug en arrière-plan (ne bloque pas le traitement de la page)"""
+	_DEBUG_PENDING.append(_debug_writer().submit(cv2.imwrite, path, img))
+
+def flush_debug_writes():
+	"""Attend la fin des écritures de debug en cours"""
+	while _DEBUG_PENDING:
+		_DEBUG_PENDING.pop().result()
+
+def crop_footer_with_orb(img, tpl, min_match_count=10, search_factor=2, scale=1.0, tpl_features=None,
+		debug_dir=None, debug_name="footer", metrics=None, show=False):
+	"""Coupe la page juste au-dessus du pied de page retrouvé par ORB + homographie.
+
+	Sans GUI par défaut : `show=True` rétablit l'affichage OpenCV bloquant, `debug_dir`
+	écrit les points retrouvés (page + template) en asynchrone. `tpl_features` :
+	(points, descripteurs) ORB précalculés du template (cf. TemplateBank). Si `metrics`
+	est un dict, il reçoit le nombre de matches, les inliers, le y de coupe et le temps.
+	Renvoie l'image inchangée si le pied de page n'est pas retrouvé.
+	"""
+	t0 = time.perf_counter()
+	m = {"matches": 0, "kept": 0, "inliers": 0, "inlier_ratio": 0.0, "min_y": None}
+
+	def done(result):
+		m["time_s"] = time.perf_counter() - t0
+		if metrics is not None:
+			metrics.update(m)
+		return result
+
+	img_gray = to_gray(img)
+	tpl_gray = to_gray(tpl)
 
 	h_img, w_img = img_gray.shape
 	h_tpl, w_tpl = tpl_gray.shape
@@ -34,65 +79,79 @@ def crop_footer_with_orb(img, tpl, min_match_count=10, search_factor=2):
 	search_height = min(h_img, h_tpl * search_factor)
 	y_offset = h_img - search_height
 	roi = img_gray[y_offset:, :]  # bas de l'image
+	if scale < 1.0:
+		# Niveau de pyramide réduit : ORB sur moins de pixels, coordonnées remises à l'échelle après
+		roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+		tpl_gray = cv2.resize(tpl_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-	# ORB
-	orb = cv2.ORB_create(5000)
-	kp1, des1 = orb.detectAndCompute(tpl_gray, None)
+	# ORB (features du template réutilisées si déjà calculées à pleine résolution)
+	orb = cv2.ORB_create(ORB_FEATURES)
+	if tpl_features is not None and scale >= 1.0:
+		pts1, des1 = tpl_features
+	else:
+		kp1, des1 = orb.detectAndCompute(tpl_gray, None)
+		pts1 = np.float32([k.pt for k in kp1]).reshape(-1, 2)
 	kp2, des2 = orb.detectAndCompute(roi, None)
 
 	if des1 is None or des2 is None:
 		print("Pas de features détectées")
-		return False
+		return done(img)
 
 	bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
 	matches = bf.match(des1, des2)
 	matches = sorted(matches, key=lambda x: x.distance)
+	m["matches"] = len(matches)
 	print(len(matches), " match trouvés")
 	matches = matches[:len(matches) // 2]
-	if len(matches) > min_match_count:
-		tpl_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1,1,2)
-		roi_pts = np.float32([kp2[m.trainIdx].pt for m in matches]).reshape(-1,1,2)
-
-		# Homography (RANSAC pour robustesse)
-		M, mask = cv2.findHomography(tpl_pts, roi_pts, cv2.RANSAC, 5.0)
-		print(M)
-		if check_homography_valid(M):
-
-			inliers_tpl_pts = tpl_pts[mask.ravel() == 1]
-			inliers_tpl_pts_dst = cv2.perspectiveTransform(inliers_tpl_pts, M)
-
-			# Décalage vertical du roi
-			inliers_tpl_pts_dst[:,:,1] += y_offset
-			min_y = int(np.min(inliers_tpl_pts_dst[:,0,1]))
-			print("min point : ", min_y)
-
-			img_cropped = img[:min_y, :]
-			
-			img_display = img.copy()  # Pour ne pas modifier l’original
-			for pt in inliers_tpl_pts_dst:
-				x, y = int(pt[0][0]), int(pt[0][1])
-				cv2.circle(img_display, (x, y), 5, (0, 0, 255), -1)  # rouge, rayon 5
-			tpl_gray_display = tpl_gray.copy()  # Pour ne pas modifier l’original
-			for pt in inliers_tpl_pts:
-				x, y = int(pt[0][0]), int(pt[0][1])
-				cv2.circle(tpl_gray_display, (x, y), 5, (0, 0, 255), -1)  # rouge, rayon 5
+	m["kept"] = len(matches)
+	if len(matches) <= min_match_count:
+		print(f"Pas assez de matches: {len(matches)}")
+		return done(img)
+
+	tpl_pts = pts1[[mt.queryIdx for mt in matches]].reshape(-1,1,2)
+	roi_pts = np.float32([kp2[mt.trainIdx].pt for mt in matches]).reshape(-1,1,2)
+
+	# Homography (RANSAC pour robustesse)
+	M, mask = cv2.findHomography(tpl_pts, roi_pts, cv2.RANSAC, 5.0)
+	if M is None or not check_homography_valid(M):
+		print(f"Homographie non calculable")
+		return done(img)
+
+	inliers = mask.ravel() == 1
+	m["inliers"] = int(np.count_nonzero(inliers))
+	m["inlier_ratio"] = m["inliers"] / len(matches)
+	inliers_tpl_pts = tpl_pts[inliers]
+	inliers_tpl_pts_dst = cv2.perspectiveTransform(inliers_tpl_pts, M)
+	if scale < 1.0:
+		inliers_tpl_pts_dst /= scale
+
+	# Décalage vertical du roi
+	inliers_tpl_pts_dst[:,:,1] += y_offset
+	min_y = int(np.min(inliers_tpl_pts_dst[:,0,1]))
+	m["min_y"] = min_y
+	print(f"On coupe à {min_y}px sur une hauteur totale de {h_img} et un y_offset de {y_offset}")
+
+	if debug_dir or show:
+		img_display = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img.copy()
+		for pt in inliers_tpl_pts_dst:
+			x, y = int(pt[0][0]), int(pt[0][1])
+			cv2.circle(img_display, (x, y), 5, (0, 0, 255), -1)  # rouge, rayon 5
+		tpl_gray_display = cv2.cvtColor(tpl_gray, cv2.COLOR_GRAY2BGR)
+		for pt in inliers_tpl_pts:
+			x, y = int(pt[0][0]), int(pt[0][1])
+			cv2.circle(tpl_gray_display, (x, y), 5, (0, 0, 255), -1)  # rouge, rayon 5
+		if debug_dir:
+			os.makedirs(debug_dir, exist_ok=True)
+			write_debug_image(os.path.join(debug_dir, f"{debug_name}_page.png"), img_display)
+			write_debug_image(os.path.join(debug_dir, f"{debug_name}_template.png"), tpl_gray_display)
+		if show:
 			cv2.imshow("Points transformés", img_display)
 			cv2.imshow("Points template", tpl_gray_display)
 			cv2.waitKey(0)
 			cv2.destroyAllWindows()
 
-			print("hauteur template : ", h_tpl)
-			print ("img height : ", img.shape[0])
-			print(f"On coupe à {min_y}px sur une hauteur totale de {h_img} et un y_offset de {y_offset}")
-			
-			#find_real_end(img[:y_crop, :])
-			return img_cropped
-		else:
-			print(f"Homographie non calculable")
-			return img
-	else:
-		print(f"Pas assez de matches: {len(matches)}")
-		return img
+	#find_real_end(img[:y_crop, :])
+	return done(img[:min_y, :])
 
 def find_real_end(img, template):
 	# On prend la bande juste avant le footer détecté
@@ -110,54 +169,323 @@ def find_real_end(img, template):
 	y_crop = max(0, y_footer - (h - last_line_with_text))
 	return y_crop
 
-def remove_ad_areas_and_concat(img, templates, threshold):
-
-	my_bool = True
-	
-	while my_bool:
-		for tpl in templates:
-			img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-			h, w = img.shape[:2]
-			tpl_gray = cv2.cvtColor(tpl, cv2.COLOR_BGR2GRAY)
-			tpl_w, tpl_h = tpl_gray.shape[::-1]
-			res = cv2.matchTemplate(img_gray, tpl_gray, cv2.TM_CCOEFF_NORMED)
-			loc = np.where(res >= threshold)
-			# Chercher le point avec la plus grande coordonnée y
-			pts = list(zip(*loc[::-1]))
-			if pts:
-				# On prend le y max (le plus bas)
-				pt_max = max(pts, key=lambda pt: pt[1])
-				x, y = pt_max[0], pt_max[1]
-				(y1, y2) = (y, y+tpl_h)
-				print("suppression de :", y1, y2)
-				# Coupe et recolle la partie sous le bloc à la place du bloc
-				img = np.vstack((img[:y1, :], img[y2:, :]))
-
-				break  # On sort du for et on recommence while True
+def to_gray(img):
+	"""Convertit en niveaux de gris (sans copie si l'image l'est déjà)"""
+	if img.ndim == 2:
+		return img
+	return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def nms_rows(row_scores, threshold, min_dist):
+	"""Suppression verticale : un y par bloc, espacés d'au moins min_dist.
+
+	Comme l'ancienne boucle (qui retirait toujours la correspondance la plus basse puis
+	recommençait), on part du bas : la ligne la plus basse au-dessus du seuil est gardée
+	et les candidats à moins de min_dist au-dessus d'elle appartiennent au même bloc.
+	"""
+	candidates = np.flatnonzero(row_scores >= threshold)
+	kept = []
+	for y in candidates[::-1]:
+		if not kept or kept[-1] - y >= min_dist:
+			kept.append(int(y))
+	return kept[::-1]
+
+def match_template_rows(img_gray, tpl_gray, threshold):
+	"""Renvoie les y de toutes les occurrences du template dans l'image (un seul matchTemplate)"""
+	tpl_h, tpl_w = tpl_gray.shape
+	if tpl_h > img_gray.shape[0] or tpl_w > img_gray.shape[1]:
+		return []
+	res = cv2.matchTemplate(img_gray, tpl_gray, cv2.TM_CCOEFF_NORMED)
+	# Meilleur score de chaque ligne : un bloc pub = une seule hauteur à supprimer
+	row_scores = res.max(axis=1)
+	return nms_rows(row_scores, threshold, tpl_h)
+
+def match_template_rows_pyramid(img_gray, tpl_gray, threshold, scale=0.25, coarse_margin=0.1):
+	"""Recherche grossière sur l'image réduite puis affinage pleine résolution autour de chaque candidat"""
+	h_img = img_gray.shape[0]
+	tpl_h = tpl_gray.shape[0]
+	small_img = cv2.resize(img_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+	small_tpl = cv2.resize(tpl_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+	if min(small_tpl.shape) < 8:
+		# Template trop petit pour ce niveau de pyramide → recherche pleine résolution
+		return match_template_rows(img_gray, tpl_gray, threshold)
+
+	# Seuil abaissé au niveau grossier pour ne pas rater un bloc flouté par la réduction
+	coarse_rows = match_template_rows(small_img, small_tpl, threshold - coarse_margin)
+	pad = 2 * int(math.ceil(1 / scale))
+	rows = []
+	for y_small in coarse_rows:
+		y_top = max(0, int(y_small / scale) - pad)
+		y_bot = min(h_img, int(y_small / scale) + tpl_h + pad)
+		if y_bot - y_top < tpl_h:
+			continue
+		res = cv2.matchTemplate(img_gray[y_top:y_bot], tpl_gray, cv2.TM_CCOEFF_NORMED)
+		# Même choix qu'en pleine résolution : la ligne la plus basse au-dessus du seuil
+		above = np.flatnonzero(res.max(axis=1) >= threshold)
+		if above.size:
+			rows.append(y_top + int(above[-1]))
+	return sorted(set(rows))
+
+def normalize_bands(bands, h_img, min_height):
+	"""Convertit des bandes (y0, y1) en intervalles valides ; valeurs négatives = depuis le bas, None = bord"""
+	if not bands:
+		return [(0, h_img)]
+	out = []
+	for y0, y1 in bands:
+		y0 = 0 if y0 is None else (h_img + y0 if y0 < 0 else y0)
+		y1 = h_img if y1 is None else (h_img + y1 if y1 < 0 else y1)
+		y0, y1 = max(0, y0), min(h_img, y1)
+		if y1 - y0 >= min_height:
+			out.append((y0, y1))
+	return out
+
+def parse_bands(spec):
+	"""« y0:y1,y0:y1 » → [(y0, y1), ...] pour normalize_bands (borne vide = bord, négative = depuis le bas)"""
+	if not spec:
+		return None
+	bands = []
+	for part in spec.split(","):
+		y0, sep, y1 = part.strip().partition(":")
+		if not sep:
+			raise ValueError(f"bande invalide (attendu y0:y1) : {part!r}")
+		bands.append((int(y0) if y0.strip() else None, int(y1) if y1.strip() else None))
+	return bands
+
+def find_template_rows(img_gray, tpl_gray, threshold, scale=1.0, bands=None):
+	"""Cherche le template, éventuellement en pyramide (scale < 1) et limité à des bandes horizontales"""
+	rows = []
+	for y0, y1 in normalize_bands(bands, img_gray.shape[0], tpl_gray.shape[0]):
+		band = img_gray[y0:y1]
+		if scale < 1.0:
+			ys = match_template_rows_pyramid(band, tpl_gray, threshold, scale)
 		else:
-			# Le for s'est terminé sans break → on peut sortir du while
-			my_bool = False
-			break
+			ys = match_template_rows(band, tpl_gray, threshold)
+		rows.extend(y0 + y for y in ys)
+	return sorted(set(rows))
 
+def check_pyramid_accuracy(img, templates, threshold, scale=0.25, bands=None, tol=2):
+	"""Compare la recherche rapide (pyramide/bandes) à la recherche pleine résolution sur une page"""
+	img_gray = to_gray(img)
+	report = {"ref_hits": 0, "missed": 0, "extra": 0, "max_dy": 0, "full_s": 0.0, "fast_s": 0.0}
+	for tpl in templates:
+		tpl_gray = to_gray(tpl)
+		t0 = time.perf_counter()
+		ref = find_template_rows(img_gray, tpl_gray, threshold)
+		t1 = time.perf_counter()
+		fast = find_template_rows(img_gray, tpl_gray, threshold, scale=scale, bands=bands)
+		t2 = time.perf_counter()
+		report["full_s"] += t1 - t0
+		report["fast_s"] += t2 - t1
+		report["ref_hits"] += len(ref)
+		fast_left = list(fast)
+		for y in ref:
+			dys = [abs(y - yf) for yf in fast_left]
+			if dys and min(dys) <= tol:
+				k = int(np.argmin(dys))
+				report["max_dy"] = max(report["max_dy"], dys[k])
+				fast_left.pop(k)
+			else:
+				report["missed"] += 1
+		report["extra"] += len(fast_left)
+	speedup = report["full_s"] / report["fast_s"] if report["fast_s"] else float("inf")
+	print(f"🎯 {report['ref_hits']} blocs de référence, {report['missed']} ratés, {report['extra']} en trop, "
+		f"écart max {report['max_dy']}px — x{speedup:.1f} plus rapide")
+	return report
+
+def remove_ad_areas_and_concat(img, templates, threshold, stats=None, scale=1.0, bands=None):
+	"""Supprime en une passe toutes les bandes qui correspondent à un template.
+
+	La page est convertie en gris une seule fois, chaque template est cherché une
+	seule fois, puis toutes les bandes trouvées sont retirées via un masque de lignes.
+	`scale` < 1 active la recherche pyramidale, `bands` limite la recherche à des
+	bandes horizontales (voir normalize_bands).
+	Si `stats` est un dict, il est rempli avec le nombre de bandes et les temps (s).
+	"""
+	t0 = time.perf_counter()
+	img_gray = to_gray(img)
+	keep = np.ones(img.shape[0], dtype=bool)
+	n_hits = 0
+	for tpl in templates:
+		tpl_gray = to_gray(tpl)
+		tpl_h = tpl_gray.shape[0]
+		for y in find_template_rows(img_gray, tpl_gray, threshold, scale=scale, bands=bands):
+			print("suppression de :", y, y + tpl_h)
+			keep[y:y + tpl_h] = False
+			n_hits += 1
+	t1 = time.perf_counter()
+
+	# Coupe et recolle toutes les bandes d'un coup (une seule copie)
+	if not keep.all():
+		img = img[keep]
+	t2 = time.perf_counter()
+
+	if stats is not None:
+		stats.update({
+			"hits": n_hits,
+			"rows_removed": int(keep.size - np.count_nonzero(keep)),
+			"match_s": t1 - t0,
+			"cut_s": t2 - t1,
+		})
 	return img
 
-def process_images(img_path, output_img_path, templates_folder):
+def crop_footer(img, bank, footer="fixed", scale=1.0, debug_dir=None, debug_name="footer"):
+	"""Retire le pied de page : coupe fixe, ou ORB sur les templates de la banque (repli sur la coupe fixe)"""
+	if footer == "orb":
+		for idx, tpl_gray in enumerate(bank.grays):
+			metrics = {}
+			cropped = crop_footer_with_orb(img, tpl_gray, scale=scale, tpl_features=bank.orb_features(idx),
+				debug_dir=debug_dir, debug_name=f"{debug_name}_{bank.names[idx]}", metrics=metrics)
+			print(f"🔍 ORB {bank.names[idx]} : {metrics['matches']} matches, "
+				f"{metrics['inlier_ratio']:.0%} inliers, {metrics['time_s']:.3f}s")
+			if metrics["min_y"] is not None:
+				return cropped
+		print("⚠️ Pied de page non retrouvé par ORB, coupe fixe")
+	return img[:-FOOTER_CROP_PX, :]
+
+def process_images(img_path, output_img_path, templates_folder, scale=1.0, bands=None,
+		footer="fixed", debug_dir=None):
 	print(f"process_images : {img_path}")
 	THRESHOLD=0.3
-	footer_templates = [cv2.imread(f) for f in sorted(glob(os.path.join(templates_folder, "*.png")))]
+	# Templates chargés une seule fois par processus (cache .npz à côté du dossier)
+	bank = get_template_bank(templates_folder)
+	footer_templates = bank.grays
 	img = cv2.imread(img_path)
-	img_wo_ad = remove_ad_areas_and_concat(img, footer_templates, THRESHOLD)
-	# img_cropped = crop_footer_with_orb(img_wo_ad, footer_templates)
-	img_cropped = img_wo_ad[:-200, :]
-	cv2.imwrite(output_img_path, img_cropped)
+	if img is None:
+		raise IOError(f"image illisible : {img_path}")
+	stats = {}
+	img_wo_ad = remove_ad_areas_and_concat(img, footer_templates, THRESHOLD, stats=stats, scale=scale, bands=bands)
+	print(f"⏱️ {stats['hits']} bandes supprimées ({stats['rows_removed']} px) : "
+		f"match {stats['match_s']:.3f}s, découpe {stats['cut_s']:.3f}s")
+	img_cropped = crop_footer(img_wo_ad, bank, footer=footer, scale=scale, debug_dir=debug_dir,
+		debug_name=os.path.splitext(os.path.basename(img_path))[0])
+	if not cv2.imwrite(output_img_path, img_cropped):
+		raise IOError(f"écriture impossible : {output_img_path}")
+
 
+def is_up_to_date(img_path, output_img_path):
+	"""Sortie déjà produite et plus récente que l'entrée → rien à refaire"""
+	return (os.path.exists(output_img_path)
+			and os.path.getmtime(output_img_path) >= os.path.getmtime(img_path))
 
-def process_images_folder(input_folder, output_folder, templates_folder):
+def _init_worker(templates_folder):
+	# Une banque de templates par worker, chargée avant la première page
+	get_template_bank(templates_folder)
+
+def _process_one(task):
+	img_path, output_img_path, templates_folder, options = task
+	t0 = time.perf_counter()
+	try:
+		process_images(img_path, output_img_path, templates_folder, **options)
+		return img_path, None, time.perf_counter() - t0
+	except Exception as e:
+		return img_path, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+	finally:
+		flush_debug_writes()
+
+def process_images_folder(input_folder, output_folder, templates_folder, scale=1.0, bands=None,
+		workers=1, force=False, failures_path=None, footer="fixed", debug_dir=None):
+	"""Nettoie tous les PNG du dossier, en parallèle si workers > 1.
+
+	Les pages dont la sortie est plus récente que l'entrée sont sautées (sauf `force`).
+	Les échecs n'interrompent pas le lot : ils sont listés dans un manifeste JSON
+	(par défaut <output_folder>/failures.json).
+	"""
 	os.makedirs(output_folder, exist_ok=True)
-	for img_path in glob(os.path.join(input_folder, "*.png")):
+	failures_path = failures_path or os.path.join(output_folder, "failures.json")
+	options = {"scale": scale, "bands": bands, "footer": footer, "debug_dir": debug_dir}
+	tasks = []
+	skipped = 0
+	for img_path in sorted(glob(os.path.join(input_folder, "*.png"))):
 		output_img_path = output_folder + "/" + os.path.basename(img_path)
-		process_images(img_path, output_img_path, templates_folder)
+		if not force and is_up_to_date(img_path, output_img_path):
+			skipped += 1
+			continue
+		tasks.append((img_path, output_img_path, templates_folder, options))
+	print(f"📁 {len(tasks)} pages à traiter, {skipped} déjà à jour | workers: {workers}")
+
+	failures = []
+	t0 = time.perf_counter()
+
+	def report(done, result):
+		img_path, error, elapsed = result
+		if error:
+			failures.append({"image": img_path, "error": error})
+			print(f"❌ {os.path.basename(img_path)} : {error}")
+		rate = done / (time.perf_counter() - t0)
+		print(f"📈 [{done}/{len(tasks)}] {os.path.basename(img_path)} en {elapsed:.2f}s — {rate:.2f} pages/s")
+
+	try:
+		if workers <= 1:
+			_init_worker(templates_folder)
+			for done, task in enumerate(tasks, 1):
+				report(done, _process_one(task))
+		else:
+			with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+				initargs=(templates_folder,)) as ex:
+				futures = {ex.submit(_process_one, t): t for t in tasks}
+				for done, fut in enumerate(as_completed(futures), 1):
+					try:
+						result = fut.result()
+					except BrokenProcessPool as e:
+						# Worker tué (OOM, plantage OpenCV) : la page et les suivantes sont notées en échec
+						result = (futures[fut][0], f"{type(e).__name__}: {e}", 0.0)
+					report(done, result)
+	finally:
+		# Manifeste toujours écrit, même si le lot est interrompu
+		total_s = time.perf_counter() - t0
+		with open(failures_path, "w", encoding="utf-8") as f:
+			json.dump(failures, f, ensure_ascii=False, indent=2)
+	print(f"✅ {len(tasks) - len(failures)} pages nettoyées en {total_s:.1f}s, "
+		f"{len(failures)} échecs (→ {failures_path})")
+	return failures
+
+def check_pyramid_folder(input_folder, templates_folder, scale=0.25, bands=None, threshold=0.3, limit=None):
+	"""Lance check_pyramid_accuracy sur les pages du dossier et cumule les écarts"""
+	templates = get_template_bank(templates_folder).grays
+	total = {"pages": 0, "ref_hits": 0, "missed": 0, "extra": 0, "max_dy": 0, "full_s": 0.0, "fast_s": 0.0}
+	for img_path in sorted(glob(os.path.join(input_folder, "*.png")))[:limit]:
+		img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+		if img is None:
+			print(f"❌ image illisible : {img_path}")
+			continue
+		print(f"🔬 {os.path.basename(img_path)}")
+		report = check_pyramid_accuracy(img, templates, threshold, scale=scale, bands=bands)
+		total["pages"] += 1
+		for k in ("ref_hits", "missed", "extra", "full_s", "fast_s"):
+			total[k] += report[k]
+		total["max_dy"] = max(total["max_dy"], report["max_dy"])
+	speedup = total["full_s"] / total["fast_s"] if total["fast_s"] else float("inf")
+	print(f"✅ {total['pages']} pages : {total['ref_hits']} blocs de référence, {total['missed']} ratés, "
+		f"{total['extra']} en trop, écart max {total['max_dy']}px — x{speedup:.1f} plus rapide")
+	return total
+
+
+def parse_args():
+	ap = argparse.ArgumentParser()
+	ap.add_argument("input_folder", nargs="?", default="DB/png")
+	ap.add_argument("output_folder", nargs="?", default="DB/cleaned_png")
+	ap.add_argument("templates_folder", nargs="?", default="DB/templates")
+	ap.add_argument("--workers", type=int, default=1, help="nombre de processus (0 = tous les cœurs)")
+	ap.add_argument("--scale", type=float, default=1.0, help="niveau de pyramide pour la recherche (<1 = grossier→fin)")
+	ap.add_argument("--bands", type=parse_bands, default=None,
+		help="recherche limitée à ces bandes, ex. « 0:3000,-4000: » (borne vide = bord, négative = depuis le bas)")
+	ap.add_argument("--check_pyramid", action="store_true",
+		help="ne nettoie rien : compare --scale/--bands à la recherche pleine résolution sur les pages")
+	ap.add_argument("--check_limit", type=int, default=None, help="nombre max de pages pour --check_pyramid")
+	ap.add_argument("--force", action="store_true", help="retraiter même les pages déjà à jour")
+	ap.add_argument("--failures", default=None, help="manifeste JSON des échecs")
+	ap.add_argument("--footer", choices=["fixed", "orb"], default="fixed",
+		help=f"pied de page : coupe fixe de {FOOTER_CROP_PX}px ou détection ORB")
+	ap.add_argument("--debug_dir", default=None, help="dossier des images de debug ORB (aucune GUI)")
+	return ap.parse_args()
 
 
 if __name__ == "__main__":
-	process_images_folder("DB/png", "DB/cleaned_png", "DB/templates")
\ No newline at end of file
+	args = parse_args()
+	if args.check_pyramid:
+		# Sans --scale < 1, on vérifie le niveau de pyramide par défaut de check_pyramid_accuracy
+		check_pyramid_folder(args.input_folder, args.templates_folder, scale=args.scale if args.scale < 1.0 else 0.25,
+			bands=args.bands, limit=args.check_limit)
+	else:
+		process_images_folder(args.input_folder, args.output_folder, args.templates_folder,
+			scale=args.scale, bands=args.bands, workers=args.workers or os.cpu_count() or 1,
+				force=args.force, failures_path=args.failures, footer=args.footer, debug_dir=args.debug_dir)
@@ -2,44 +2,81 @@ import sys
 import os
 from PIL import Image
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-def is_blank_line(pixels, min_white_ratio=0.9):
-    """Détermine si une ligne contient principalement du blanc"""
-    white_pixels = np.sum(pixels > 245)
-    ratio = white_pixels / len(pixels)
-    return ratio >= min_white_ratio
+# Tranches intermédiaires relues aussitôt par magick : compression PNG minimale
+PNG_COMPRESS_LEVEL = 1
 
-def find_cut_lines(im_array, slice_height=900, step=100, min_blank_ratio=1):
-    """Cherche les meilleures lignes de découpe en détectant les bandes blanches"""
+def white_profile(im_array, white_thresh=245):
+    """Proportion de pixels blancs de chaque ligne (une seule réduction NumPy)"""
+    return np.count_nonzero(im_array > white_thresh, axis=1) / im_array.shape[1]
+
+def find_cut_lines(im_array, slice_height=900, step=100, min_blank_ratio=1, mode="first", profile=None):
+    """Cherche les meilleures lignes de découpe en détectant les bandes blanches.
+
+    mode="first"   : première ligne candidate (pas de 80px autour de la cible) assez blanche
+    mode="whitest" : ligne la plus blanche de toute la fenêtre [cible - step, cible + step]
+    `profile` : blancheur par ligne déjà calculée (white_profile) ; sinon seules les
+    lignes des fenêtres de recherche sont évaluées, en une réduction par fenêtre.
+    """
     height = im_array.shape[0]
+    offsets = np.arange(-step, step + 1, 80)
     cut_positions = [0]
     y = 0
 
     while y + slice_height < height:
-        best_cut = y + slice_height
-        found = False
-        for dy in range(-step, step + 1, 80):
-            scan_y = y + slice_height + dy
-            if scan_y >= height or scan_y <= y:
-                continue
-            line = im_array[scan_y, :]
-            if is_blank_line(line, min_blank_ratio):
-                best_cut = scan_y
-                found = True
-                break
+        target = y + slice_height
+        best_cut = target
+        if mode == "whitest":
+            lo, hi = max(y + 1, target - step), min(height, target + step + 1)
+            window = profile[lo:hi] if profile is not None else white_profile(im_array[lo:hi])
+            candidates = np.flatnonzero(window == window.max())
+            # À blancheur égale, on garde la ligne la plus proche de la cible
+            best_cut = lo + int(candidates[np.argmin(np.abs(candidates + lo - target))])
+        else:
+            scan = target + offsets
+            scan = scan[(scan < height) & (scan > y)]
+            ratios = profile[scan] if profile is not None else white_profile(im_array[scan])
+            blank = scan[ratios >= min_blank_ratio]
+            if blank.size:
+                best_cut = int(blank[0])
         cut_positions.append(best_cut)
         y = best_cut
 
     cut_positions.append(height)
     return cut_positions
 
-def crop_and_save_slices(img, cut_positions, out_prefix):
-    for i in range(len(cut_positions) - 1):
-        top = cut_positions[i]
-        bottom = cut_positions[i + 1]
-        cropped = img.crop((0, top, img.width, bottom))
+def load_and_slice(input_path, crop_width=None, cut_mode="first"):
+    """Décode l'image une seule fois et renvoie les tranches RGB (vues NumPy, sans copie).
+
+    Les tranches peuvent être passées telles quelles à l'étape OCR suivante
+    ou écrites sur disque avec save_slices.
+    """
+    img = Image.open(input_path).convert("RGB")
+    rgb = np.asarray(img)
+    # Niveaux de gris dérivés de l'image déjà décodée (pas de second décodage PNG)
+    gray = np.asarray(img.convert("L"))
+
+    if crop_width:
+        left = 10
+        right = min(rgb.shape[1], left + crop_width)
+        rgb = rgb[:, left:right]
+        gray = gray[:, left:right]
+        print(f"📐 Recadrage horizontal appliqué : x={left} à {right}")
+
+    print("🔎 Détection intelligente des lignes blanches…")
+    cut_positions = find_cut_lines(gray, slice_height=880, step=100, min_blank_ratio=1, mode=cut_mode)
+    print(f"✂️ {len(cut_positions) - 1} segments détectés")
+    return [rgb[top:bottom] for top, bottom in zip(cut_positions, cut_positions[1:])]
+
+def save_slices(slices, out_prefix, workers=None):
+    """Écrit les tranches en PNG en parallèle (l'encodage zlib libère le GIL)"""
+    def save(i, arr):
         out_path = f"{out_prefix}_{str(i).zfill(3)}.png"
-        cropped.save(out_path)
+        Image.fromarray(arr).save(out_path, compress_level=PNG_COMPRESS_LEVEL)
+        return out_path
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(save, range(len(slices)), slices))
 
 def main():
     if len(sys.argv) < 3:
@@ -55,25 +92,9 @@ def main():
         sys.exit(1)
 
     print(f"📥 Lecture : {input_path}")
-    img = Image.open(input_path).convert("L")  # niveaux de gris pour détection blanche
-
-    if crop_width:
-        left = 10
-        right = min(img.width, left + crop_width)
-        img = img.crop((left, 0, right, img.height))
-        print(f"📐 Recadrage horizontal appliqué : x={left} à {right}")
-
-    im_array = np.array(img)
-
-    print("🔎 Détection intelligente des lignes blanches…")
-    cut_positions = find_cut_lines(im_array, slice_height=880, step=100, min_blank_ratio=1)
-    print(f"✂️ {len(cut_positions) - 1} segments détectés")
-
-    img_rgb = Image.open(input_path).convert("RGB")
-    if crop_width:
-        img_rgb = img_rgb.crop((left, 0, right, img_rgb.height))
-
-    crop_and_save_slices(img_rgb, cut_positions, out_prefix)
+    cut_mode = os.environ.get("CROP_CUT_MODE", "first")  # "first" ou "whitest"
+    slices = load_and_slice(input_path, crop_width, cut_mode=cut_mode)
+    save_slices(slices, out_prefix)
     print("✅ Découpe terminée.")
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import os
+import json
+from glob import glob
+import cv2
+import numpy as np
+
+ORB_FEATURES = 5000
+
+class TemplateBank:
+	"""Templates (pubs / pieds de page) chargés une seule fois : gris + points et descripteurs ORB.
+
+	Le cache est persisté dans un .npz à côté du dossier des templates et
+	reconstruit dès qu'un PNG est ajouté, supprimé ou modifié (mtime/taille).
+	"""
+
+	def __init__(self, templates_folder, nfeatures=ORB_FEATURES):
+		self.templates_folder = os.path.normpath(templates_folder)
+		self.cache_path = self.templates_folder + "_bank.npz"
+		self.nfeatures = nfeatures
+		self.names = []
+		self.grays = []
+		self.orb_pts = []   # coordonnées (x, y) des keypoints ORB de chaque template
+		self.orb_des = []   # descripteurs ORB correspondants (None si aucun)
+		self.load()
+
+	def __len__(self):
+		return len(self.grays)
+
+	def signature(self):
+		"""Empreinte du dossier : noms, mtime et taille de chaque template + paramètres ORB"""
+		sig = []
+		for f in sorted(glob(os.path.join(self.templates_folder, "*.png"))):
+			st = os.stat(f)
+			sig.append([os.path.basename(f), st.st_mtime_ns, st.st_size])
+		return json.dumps({"files": sig, "nfeatures": self.nfeatures})
+
+	def load(self):
+		sig = self.signature()
+		if not self._load_cache(sig):
+			self._build()
+			self._save_cache(sig)
+		return self
+
+	def _build(self):
+		print(f"🧱 Construction de la banque de templates : {self.templates_folder}")
+		orb = cv2.ORB_create(self.nfeatures)
+		self.names, self.grays, self.orb_pts, self.orb_des = [], [], [], []
+		for f in sorted(glob(os.path.join(self.templates_folder, "*.png"))):
+			gray = cv2.imread(f, cv2.IMREAD_GRAYSCALE)
+			if gray is None:
+				print(f"⚠️ Template illisible : {f}")
+				continue
+			kp, des = orb.detectAndCompute(gray, None)
+			self.names.append(os.path.basename(f))
+			self.grays.append(gray)
+			self.orb_pts.append(np.float32([k.pt for k in kp]).reshape(-1, 2))
+			self.orb_des.append(des)
+
+	def _load_cache(self, sig):
+		if not os.path.exists(self.cache_path):
+			return False
+		try:
+			with np.load(self.cache_path, allow_pickle=False) as data:
+				if str(data["signature"]) != sig:
+					return False
+				n = int(data["count"])
+				self.names = [str(x) for x in data["names"]]
+				self.grays = [data[f"gray_{i}"] for i in range(n)]
+				self.orb_pts = [data[f"pts_{i}"] for i in range(n)]
+				self.orb_des = [data[f"des_{i}"] if f"des_{i}" in data else None for i in range(n)]
+		except Exception as e:
+			print(f"⚠️ Cache de templates illisible ({e}), reconstruction")
+			return False
+		return True
+
+	def _save_cache(self, sig):
+		arrays = {
+			"signature": np.array(sig),
+			"count": np.array(len(self.grays)),
+			"names": np.array(self.names, dtype=str),
+		}
+		for i, (gray, pts, des) in enumerate(zip(self.grays, self.orb_pts, self.orb_des)):
+			arrays[f"gray_{i}"] = gray
+			arrays[f"pts_{i}"] = pts
+			if des is not None:
+				arrays[f"des_{i}"] = des
+		try:
+			# Écriture atomique : plusieurs workers peuvent construire la banque en même temps
+			tmp_path = f"{self.cache_path}.{os.getpid()}.tmp.npz"
+			np.savez(tmp_path, **arrays)
+			os.replace(tmp_path, self.cache_path)
+		except OSError as e:
+			print(f"⚠️ Impossible d'écrire le cache de templates : {e}")
+
+	def orb_features(self, idx):
+		"""(points, descripteurs) ORB du template idx, au format attendu par crop_footer_with_orb"""
+		return self.orb_pts[idx], self.orb_des[idx]
+
+
+# Une banque par dossier et par processus
+_BANKS = {}
+
+def get_template_bank(templates_folder):
+	key = os.path.normpath(templates_folder)
+	if key not in _BANKS:
+		_BANKS[key] = TemplateBank(key)
+	return _BANKS[key]
@@ -1,6 +1,15 @@
 import os
+import time
+import json
+import argparse
+import multiprocessing
+from io import BytesIO
 import numpy as np
+import img2pdf
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
+from utils_rle import find_runs
 
 # === CONFIGURATION ===
 WHITE_THRESHOLD    = 250    # pixel ≥ ce seuil est “blanc”
@@ -8,79 +17,208 @@ MIN_BAND_HEIGHT    = 1      # hauteur min (px) d’une bande sans blanc
 MIN_LAST_PAGE_FRAC = 0.3    # fraction de la hauteur moyenne pour garder la dernière page
 INPUT_DIR          = "pipeline_OCR/traitement_lot/input_png"  # dossier contenant vos PNG
 OUTPUT_DIR  = "pipeline_OCR/traitement_lot/outputs"  # dossier où seront enregistrés les PDFs
+PDF_DPI            = 150    # résolution des pages du PDF
+JPEG_QUALITY       = 75     # même qualité que l'ancien export PDF de PIL
 
 def find_black_bands(gray, white_thresh, min_height):
-    h, _     = gray.shape
-    has_white = np.any(gray >= white_thresh, axis=1)
-    no_white  = ~has_white
-
-    runs = []
-    in_run = False
-    for y, v in enumerate(no_white):
-        if v and not in_run:
-            start = y
-            in_run = True
-        elif not v and in_run:
-            end = y
-            if (end - start) >= min_height:
-                runs.append((start, end))
-            in_run = False
-    if in_run and (h - start) >= min_height:
-        runs.append((start, h))
-    return runs
-
-def process_image_to_pdf(image_path, pdf_path):
-    # ouvrir et convertir en gris
-    img   = Image.open(image_path)
-    gray  = np.array(img.convert("L"))
-    h, w  = gray.shape
+    """Plages de lignes sans aucun pixel blanc, sous forme de liste [(start, end), ...]"""
+    no_white = ~np.any(gray >= white_thresh, axis=1)
+    starts, ends = find_runs(no_white, min_height)
+    return list(zip(starts.tolist(), ends.tolist()))
 
+def page_boxes(gray):
+    """Intervalles verticaux [(top, bottom), ...] des pages séparées par les bandes sans blanc"""
+    h = gray.shape[0]
     # repérer les bandes sans blanc, ignorer marge haute & pied bas
     runs = find_black_bands(gray, WHITE_THRESHOLD, MIN_BAND_HEIGHT)
     runs = [(s, e) for (s, e) in runs if s > 0 and e < h]
     runs.sort(key=lambda x: x[0])
 
     # découper en segments (entre prev_end et start, puis fin)
-    segments = []
+    boxes = []
     prev_end = 0
     for (s, e) in runs:
         if s > prev_end:
-            segments.append(img.crop((0, prev_end, w, s)))
+            boxes.append((prev_end, s))
         prev_end = e
     if prev_end < h:
-        segments.append(img.crop((0, prev_end, w, h)))
+        boxes.append((prev_end, h))
 
     # supprimer la dernière page si trop petite
-    if len(segments) > 1:
-        heights = [s.height for s in segments]
+    if len(boxes) > 1:
+        heights = [b - t for (t, b) in boxes]
         avg_h   = sum(heights[:-1]) / (len(heights) - 1)
         if heights[-1] < avg_h * MIN_LAST_PAGE_FRAC:
-            segments.pop()
+            boxes.pop()
+    return boxes
+
+def encode_pages(img, boxes, page_format="jpeg", keep_gray=True):
+    """Encode les pages une par une (JPEG ou PNG), sans copie RGB de toutes les pages.
+
+    L'image source reste décodée en entier ; seule la page en cours d'encodage en est une copie.
+    """
+    # Les PNG en niveaux de gris restent en L (pas de passage par RGB, 3x moins de données)
+    mode = img.mode if keep_gray and img.mode in ("L", "1") else "RGB"
+    w = img.width
+    for (top, bottom) in boxes:
+        seg = img.crop((0, top, w, bottom))
+        if seg.mode != mode:
+            seg = seg.convert(mode)
+        buf = BytesIO()
+        if page_format == "png":
+            seg.save(buf, "PNG")
+        else:
+            seg.convert("L" if mode == "1" else mode).save(buf, "JPEG", quality=JPEG_QUALITY)
+        yield buf.getvalue()
+
+def write_pdf_img2pdf(img, boxes, pdf_path, page_format="jpeg", keep_gray=True):
+    """PDF via img2pdf : les flux JPEG/PNG sont recopiés tels quels (DCT/Flate), sans réencodage.
 
-    # assembler en PDF via PIL
-    rgb_segs = [s.convert("RGB") for s in segments]
+    img2pdf attend la liste complète et garde tous les flux jusqu'à l'écriture : la mémoire
+    est celle de l'image source + des pages compressées, pas bornée à une page.
+    """
+    pages = list(encode_pages(img, boxes, page_format, keep_gray))
+    layout = img2pdf.get_fixed_dpi_layout_fun((PDF_DPI, PDF_DPI))
+    # Écriture dans un fichier temporaire : un PDF interrompu ne passe jamais pour « à jour »
+    tmp_path = pdf_path + ".part"
+    with open(tmp_path, "wb") as f:
+        img2pdf.convert(pages, layout_fun=layout, outputstream=f)
+    os.replace(tmp_path, pdf_path)
+
+def write_pdf_pil(img, boxes, pdf_path):
+    """Ancien assemblage PIL : toutes les pages converties en RGB et gardées en mémoire"""
+    w = img.width
+    rgb_segs = [img.crop((0, t, w, b)).convert("RGB") for (t, b) in boxes]
+    # Même fichier temporaire que write_pdf_img2pdf : un PDF interrompu n'est jamais renommé
+    tmp_path = pdf_path + ".part"
     rgb_segs[0].save(
-        pdf_path,
+        tmp_path,
         "PDF",
-        resolution=150,
+        resolution=PDF_DPI,
         save_all=True,
         append_images=rgb_segs[1:]
     )
+    os.replace(tmp_path, pdf_path)
 
-    print(f"✅ {os.path.basename(pdf_path)} créé avec {len(segments)} pages")
+def process_image_to_pdf(image_path, pdf_path, writer="img2pdf", page_format="jpeg", keep_gray=True):
+    # ouvrir et convertir en gris
+    img   = Image.open(image_path)
+    gray  = np.asarray(img if img.mode == "L" else img.convert("L"))
+    boxes = page_boxes(gray)
+    del gray
 
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if writer == "pil":
+        write_pdf_pil(img, boxes, pdf_path)
+    else:
+        write_pdf_img2pdf(img, boxes, pdf_path, page_format, keep_gray)
 
-    for fn in sorted(os.listdir(INPUT_DIR)):
+    print(f"✅ {os.path.basename(pdf_path)} créé avec {len(boxes)} pages")
+    return len(boxes)
+
+def _peak_rss_child(image_path, pdf_path, writer, queue):
+    import resource  # Unix seulement, utilisé par le benchmark uniquement
+    process_image_to_pdf(image_path, pdf_path, writer=writer)
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def benchmark_peak_rss(image_path, out_dir="/tmp"):
+    """Pic de RSS (Mo) de chaque writer, chacun mesuré dans un processus neuf"""
+    ctx = multiprocessing.get_context("spawn")
+    base = os.path.splitext(os.path.basename(image_path))[0]
+    peaks = {}
+    for writer in ("pil", "img2pdf"):
+        queue = ctx.Queue()
+        pdf_path = os.path.join(out_dir, f"{base}_{writer}.pdf")
+        proc = ctx.Process(target=_peak_rss_child, args=(image_path, pdf_path, writer, queue))
+        proc.start()
+        peaks[writer] = queue.get() / 1024  # ru_maxrss est en Ko sous Linux
+        proc.join()
+        print(f"[RSS] {writer:7s} : pic {peaks[writer]:.0f} Mo, PDF {os.path.getsize(pdf_path) / 1e6:.1f} Mo")
+    return peaks
+
+def _convert_one(task):
+    in_path, out_path, options = task
+    t0 = time.perf_counter()
+    try:
+        pages = process_image_to_pdf(in_path, out_path, **options)
+        return {"file": os.path.basename(in_path), "pages": pages,
+                "seconds": round(time.perf_counter() - t0, 3), "error": None}
+    except Exception as e:
+        return {"file": os.path.basename(in_path), "pages": 0,
+                "seconds": round(time.perf_counter() - t0, 3), "error": f"{type(e).__name__}: {e}"}
+
+def convert_folder(input_dir, output_dir, workers=1, force=False, summary_path=None, **options):
+    """Convertit tous les PNG du dossier en PDF (pool de processus), en sautant ceux déjà à jour"""
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = summary_path or os.path.join(output_dir, "summary.json")
+    tasks, skipped = [], []
+    for fn in sorted(os.listdir(input_dir)):
         if not fn.lower().endswith(".png"):
             continue
-        in_path  = os.path.join(INPUT_DIR, fn)
+        in_path  = os.path.join(input_dir, fn)
         base     = os.path.splitext(fn)[0]
-        out_path = os.path.join(OUTPUT_DIR, base + ".pdf")
+        out_path = os.path.join(output_dir, base + ".pdf")
+        if not force and os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(in_path):
+            skipped.append(fn)
+            continue
+        tasks.append((in_path, out_path, options))
+    print(f"📁 {len(tasks)} PNG à convertir, {len(skipped)} déjà à jour | workers: {workers}")
+
+    results = []
+    t0 = time.perf_counter()
+    try:
+        if workers <= 1:
+            results = [_convert_one(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                futures = {ex.submit(_convert_one, t): t for t in tasks}
+                for fut in as_completed(futures):
+                    try:
+                        results.append(fut.result())
+                    except BrokenProcessPool as e:
+                        # Worker tué (OOM, plantage natif) : le fichier est noté en échec, le lot continue
+                        results.append({"file": os.path.basename(futures[fut][0]), "pages": 0,
+                                        "seconds": 0.0, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        # Résumé toujours écrit, même si le lot est interrompu
+        total_s = time.perf_counter() - t0
+        results.sort(key=lambda r: r["file"])
+        failures = [r for r in results if r["error"]]
+        for r in failures:
+            print(f"❌ {r['file']} : {r['error']}")
+        summary = {
+            "input_dir": input_dir,
+            "output_dir": output_dir,
+            "converted": len(results) - len(failures),
+            "skipped": skipped,
+            "failed": len(failures),
+            "pages": sum(r["pages"] for r in results),
+            "seconds": round(total_s, 3),
+            "files": results,
+        }
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"✅ {summary['converted']} PDF ({summary['pages']} pages) en {total_s:.1f}s, "
+          f"{summary['failed']} échecs → {summary_path}")
+    return summary
 
-        print(f"\n--- Traitement de {fn}")
-        process_image_to_pdf(in_path, out_path)
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input_dir", default=INPUT_DIR, help="dossier contenant les PNG")
+    ap.add_argument("--output_dir", default=OUTPUT_DIR, help="dossier des PDF générés")
+    ap.add_argument("--workers", type=int, default=0, help="nombre de processus (0 = tous les cœurs)")
+    ap.add_argument("--force", action="store_true", help="reconvertir même les PDF déjà à jour")
+    ap.add_argument("--summary", default=None, help="résumé JSON (défaut : <output_dir>/summary.json)")
+    ap.add_argument("--page_format", choices=["jpeg", "png"], default="jpeg")
+    ap.add_argument("--bench", metavar="PNG", default=None, help="mesure le pic de RSS des deux writers sur ce PNG")
+    return ap.parse_args()
+
+def main():
+    args = parse_args()
+    if args.bench:
+        benchmark_peak_rss(args.bench)
+        return
+    convert_folder(args.input_dir, args.output_dir, workers=args.workers or os.cpu_count() or 1,
+                   force=args.force, summary_path=args.summary, page_format=args.page_format)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import time
+import numpy as np
+
+def find_runs(mask, min_length=1):
+    """
+    Encode en plages (run-length) les suites de True d'un masque 1-D, sans boucle Python.
+    Renvoie deux tableaux (starts, ends) : chaque plage couvre [start, end[.
+    Seules les plages d'au moins `min_length` éléments sont gardées.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    # On borde de False pour que chaque plage ait un front montant et un front descendant
+    edges = np.diff(np.concatenate(([False], mask, [False])).view(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if min_length > 1:
+        keep = (ends - starts) >= min_length
+        starts, ends = starts[keep], ends[keep]
+    return starts, ends
+
+def _find_runs_loop(mask, min_length=1):
+    """Version boucle Python (référence du benchmark)"""
+    runs = []
+    in_run = False
+    for y, v in enumerate(mask):
+        if v and not in_run:
+            start = y
+            in_run = True
+        elif not v and in_run:
+            if (y - start) >= min_length:
+                runs.append((start, y))
+            in_run = False
+    if in_run and (len(mask) - start) >= min_length:
+        runs.append((start, len(mask)))
+    return runs
+
+def benchmark(height=200_000, density=0.3, repeat=5):
+    """Compare find_runs à la boucle Python sur un masque aléatoire de `height` lignes"""
+    rng = np.random.default_rng(0)
+    mask = rng.random(height) < density
+    starts, ends = find_runs(mask, 2)
+    assert list(zip(starts.tolist(), ends.tolist())) == _find_runs_loop(mask, 2)
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        _find_runs_loop(mask, 2)
+    t_loop = (time.perf_counter() - t0) / repeat
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        find_runs(mask, 2)
+    t_vec = (time.perf_counter() - t0) / repeat
+    print(f"[RLE] {height} lignes, {len(starts)} plages : boucle {t_loop*1000:.1f} ms, "
+          f"np.diff {t_vec*1000:.2f} ms (x{t_loop / t_vec:.0f})")
+    return t_loop, t_vec
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,10 +1,11 @@
 #!/bin/bash
 set -uo pipefail
 
-# Usage: ./batch_ocr_tester.sh <input_folder> <output_folder> <max_parallel>
+# Usage: ./batch_ocr_tester.sh <input_folder> <output_folder> <max_parallel> [postprocess_workers]
 input_folder="${1:-/data}"              # Dossier source des .png
 output_folder="${2:-/data}"              # Dossier destination des .png
 max_parallel="${3:-20}"                  # Nombre max de jobs en parallèle
+postprocess_workers="${4:-2}"            # Processus de post-traitement (LT_MAX_INFLIGHT au plus : la ferme LT est partagée)
 
 docker_img="pipeline-ocr"               # Change le nom si besoin
 
@@ -28,6 +29,8 @@ MAGICK_VARIANTS=(
 active_jobs=0
 
 echo "fichier,variant,nb_fautes,nb_caracteres,ratio" > /data/out/scoring_languagetool.csv
+postprocess_manifest="${output_folder}/postprocess_manifest.tsv"
+: > "$postprocess_manifest"
 # 2. Pour chaque fichier...
 for f in "${all_files[@]}"; do
   (
@@ -96,16 +99,10 @@ for f in "${all_files[@]}"; do
     fi
 
 
+    # Post-traitement fait en un seul lot à la fin (processus chargés une fois)
     if [[ -f "$vote_txt" ]]; then
-      python3 /tools/ocr_postprocess_all.py "$vote_txt" "$vote_txt_clean" --languagetool --log_corrections "${output_folder}/corrections_languagetool.csv"
-      cp "$vote_txt_clean" "$result_folder" # copie dans le fichier input du résultat
-      nb_carac=$(wc -m < "$vote_txt_clean")
-      nb_fautes=$(curl -s --data-urlencode "text=$(cat "$vote_txt_clean")" \
-        --data "language=fr" \
-        "http://localhost:8010/v2/check" | jq '.matches | length')
-      ratio=$(awk "BEGIN {if ($nb_carac>0) print $nb_fautes/$nb_carac; else print \"NaN\"}")
-      flock /data/out/scoring_languagetool.csv bash -c \
-       "echo \"$filename_noext,$variant,$nb_fautes,$nb_carac,$ratio\" >> /data/out/scoring_languagetool.csv"
+      flock "$postprocess_manifest" bash -c \
+       "printf '%s\t%s\n' \"$vote_txt\" \"$vote_txt_clean\" >> \"$postprocess_manifest\""
     fi
   ) &
   ((active_jobs++))
@@ -116,4 +113,22 @@ for f in "${all_files[@]}"; do
 done
 wait
 echo "✅ OCR Voting terminé pour tous les fichiers."
+
+# 3. Post-traitement de tous les votes dans un pool de processus longue durée
+if [[ -s "$postprocess_manifest" ]]; then
+  python3 /tools/ocr_postprocess_all.py --manifest "$postprocess_manifest" --workers "$postprocess_workers" \
+    --languagetool --log_corrections "${output_folder}/corrections_languagetool.csv" \
+    --summary "${output_folder}/postprocess_summary.json"
+  while IFS=$'\t' read -r vote_txt vote_txt_clean; do
+    [[ -f "$vote_txt_clean" ]] || continue
+    filename_noext=$(basename "$vote_txt" _vote.txt)
+    cp "$vote_txt_clean" "$result_folder" # copie dans le fichier input du résultat
+    nb_carac=$(wc -m < "$vote_txt_clean")
+    nb_fautes=$(curl -s --data-urlencode "text=$(cat "$vote_txt_clean")" \
+      --data "language=fr" \
+      "http://localhost:8010/v2/check" | jq '.matches | length')
+    ratio=$(awk "BEGIN {if ($nb_carac>0) print $nb_fautes/$nb_carac; else print \"NaN\"}")
+    echo "$filename_noext,vote,$nb_fautes,$nb_carac,$ratio" >> /data/out/scoring_languagetool.csv
+  done < "$postprocess_manifest"
+fi
 echo "✅ Tous les fichiers ont été traités."
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""Benchmarks hors-ligne des étapes de post-traitement OCR.
+
+Usage : python bench_ocr_scoring.py mapping [--rules 5000] [--words 50000]
+        python bench_ocr_scoring.py lt [--servers 8] [--sentences 2000]
+        python bench_ocr_scoring.py stub-lt [--ports 8010-8017]
+        python bench_ocr_scoring.py spell [--words 20000] [--vocab 3000]
+        python bench_ocr_scoring.py vote [--sentences 200] [--variants 8] [variante.txt ...]
+        python bench_ocr_scoring.py dedup [--sentences 5000]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+import ocr_postprocess_all as pp
+import vote_ocr_paragraphe as vote
+
+
+def random_word(rng, n_min=3, n_max=12):
+    return "".join(rng.choice(string.ascii_lowercase + "éèàç'") for _ in range(rng.randint(n_min, n_max)))
+
+def random_text(rng, vocab, n_words, line_len=15):
+    words = [rng.choice(vocab) for _ in range(n_words)]
+    return "\n".join(" ".join(words[i:i + line_len]) for i in range(0, n_words, line_len))
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+# --- Mapping OCR (correct_typo + apply_ocr_mapping) ---
+def _apply_mapping_sequential(text, mapping):
+    """Ancien chemin : un re.sub non compilé par règle"""
+    for pattern, repl in mapping:
+        text = re.sub(pattern, repl, text)
+    return text
+
+def bench_mapping(n_rules=5000, n_words=50000, seed=0):
+    rng = random.Random(seed)
+    sources = set()
+    while len(sources) < n_rules:
+        sources.add(random_word(rng, 5, 14))
+    custom = [(src, src.upper()) for src in sorted(sources)]
+    vocab = [random_word(rng) for _ in range(2000)] + [src for src, _ in custom[:200]]
+    text = random_text(rng, vocab, n_words)
+    mapping = pp.DEFAULT_OCR_MAPPING + custom
+
+    ref, t_old = timed(_apply_mapping_sequential, text, mapping, repeat=1)
+    t0 = time.perf_counter()
+    pp.get_ocr_rewriter.cache_clear()
+    pp.get_ocr_rewriter(tuple(custom))
+    t_build = time.perf_counter() - t0
+    out, t_new = timed(pp.apply_ocr_mapping, text, custom)
+    print(f"[MAPPING] {len(mapping)} règles, {len(text)/1e6:.1f} M caractères")
+    print(f"  re.sub séquentiel : {t_old:.2f}s")
+    print(f"  regex unique      : {t_new:.3f}s (+ compilation {t_build:.2f}s, une fois par processus)"
+          f" — identique : {out == ref}")
+
+
+# --- Serveur LanguageTool factice (benchmarks hors-ligne) ---
+class StubLTHandler(BaseHTTPRequestHandler):
+    """Répond comme /v2/check : signale chaque « oe » isolé, avec un coût fixe + par caractère.
+
+    Un verrou par serveur limite le nombre de requêtes traitées en même temps (cœurs de la JVM).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json([{"name": "French", "code": "fr", "longCode": "fr"}])
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        text = form.get("text", [""])[0]
+        srv = self.server
+        with srv.cores:
+            time.sleep(srv.base_latency + srv.per_char * len(text))
+        matches = [{"offset": m.start(), "length": 2, "message": "oe → œ",
+                    "replacements": [{"value": "œ"}], "rule": {"id": "STUB_OE"}}
+                   for m in re.finditer(r"\boe\b", text)]
+        self._send_json({"software": {"name": "StubLT", "version": "stub"}, "matches": matches})
+
+def start_stub_lt(ports, base_latency=0.02, per_char=0.00002, cores=2):
+    """Démarre un faux serveur LanguageTool par port (threads démons), renvoie les serveurs"""
+    servers = []
+    for port in ports:
+        srv = ThreadingHTTPServer(("localhost", port), StubLTHandler)
+        srv.daemon_threads = True
+        srv.base_latency, srv.per_char = base_latency, per_char
+        srv.cores = threading.BoundedSemaphore(cores)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+    return servers
+
+def parse_ports(spec):
+    lo, _, hi = spec.partition("-")
+    return list(range(int(lo), int(hi or lo) + 1))
+
+def bench_lt(n_servers=8, n_sentences=2000, base_port=18010, seed=0):
+    import lt_cache
+    import lt_client
+    import langage_tool_correction as ltc
+
+    ports = list(range(base_port, base_port + n_servers))
+    servers = start_stub_lt(ports)
+    rng = random.Random(seed)
+    vocab = [random_word(rng) for _ in range(500)] + ["oe"] * 10
+    text = " ".join(" ".join(rng.choice(vocab) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                    for _ in range(n_sentences))
+    lexique = ltc.LexiqueIndex()
+
+    results = {}
+    for label, max_chars, workers in [("séquentiel, 1 phrase/requête", 0, 1),
+                                      ("blocs, séquentiel", lt_client.LT_CHUNK_CHARS, 1),
+                                      ("blocs, parallèle", lt_client.LT_CHUNK_CHARS, None)]:
+        lt_client._POOL = lt_client.LTClientPool(ports=ports)
+        t0 = time.perf_counter()
+        results[label] = ltc.corriger_texte(text, lexique, max_chars=max_chars, workers=workers, use_cache=False)
+        dt = time.perf_counter() - t0
+        print(f"[LT] {label:30s} : {dt:.2f}s, {len(text) / dt:,.0f} caractères/s")
+        lt_client._POOL.report()
+
+    # Cache persistant : un passage à froid puis un second passage (autre variante OCR
+    # du même document : une phrase sur cinq modifiée)
+    with tempfile.TemporaryDirectory() as tmp:
+        lt_cache._CACHE = lt_cache.LTCache(os.path.join(tmp, "lt_cache.sqlite"))
+        phrases = text.split(". ")
+        variant = ". ".join(p + " oe" if i % 5 == 0 else p for i, p in enumerate(phrases))
+        for label, txt in [("cache froid", text), ("cache, variante du texte", variant)]:
+            lt_client._POOL = lt_client.LTClientPool(ports=ports)
+            t0 = time.perf_counter()
+            out = ltc.corriger_texte(txt, lexique)
+            dt = time.perf_counter() - t0
+            if txt is text:
+                results[label] = out
+            print(f"[LT] {label:30s} : {dt:.2f}s, {lt_client._POOL.stats()['requests']} requêtes")
+            lt_cache._CACHE.report()
+        lt_cache._CACHE.close()
+        lt_cache._CACHE = None
+
+    outputs = set(results.values())
+    print(f"  sorties identiques : {len(outputs) == 1}")
+    for srv in servers:
+        srv.shutdown()
+
+
+# --- Correction orthographique (SpellChecker vs index SymSpell) ---
+OCR_LETTERS = "abcdefghijklmnopqrstuvwxyzéèàçù"
+
+def ocr_noise(rng, word, n_edits=1):
+    """Une à deux fautes d'OCR : substitution, suppression, insertion ou inversion"""
+    for _ in range(n_edits):
+        i = rng.randrange(len(word) + 1)
+        op = rng.choice("sdit")
+        if op == "s" and i < len(word):
+            word = word[:i] + rng.choice(OCR_LETTERS) + word[i + 1:]
+        elif op == "d" and i < len(word) and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        elif op == "i":
+            word = word[:i] + rng.choice(OCR_LETTERS) + word[i:]
+        elif op == "t" and i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+def _spellcheck_pyspellchecker(text):
+    """Ancien chemin : SpellChecker chargé à chaque appel, correction() recalculée pour chaque token"""
+    from spellchecker import SpellChecker
+    spell = SpellChecker(language='fr')
+    def repl(m):
+        w = m.group(0)
+        c = spell.correction(w)
+        return c if c and c != w else w
+    return re.sub(r'\b\w+\b', repl, text)
+
+def bench_spell(n_words=20000, vocab_size=3000, seed=0, index_dir=None):
+    import spell_index
+    from spellchecker import SpellChecker
+
+    rng = random.Random(seed)
+    dictionary = list(SpellChecker(language='fr').word_frequency.dictionary)
+    # Vocabulaire d'un cours : mots justes, fautes d'OCR récurrentes (10 %), quelques mots à 2 fautes (1 %)
+    vocab = [rng.choice(dictionary) for _ in range(vocab_size)]
+    vocab = [ocr_noise(rng, w, 2) if i % 100 == 0 else ocr_noise(rng, w) if i % 10 == 0 else w
+             for i, w in enumerate(vocab)]
+    text = random_text(rng, vocab, n_words)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = index_dir or os.path.join(tmp, "spell_index")
+        t0 = time.perf_counter()
+        spell_index.SpellIndex.load(index_dir, lexique_path=None)
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        spell_index._INDEX = spell_index.SpellIndex.load(index_dir, lexique_path=None)
+        t_open = time.perf_counter() - t0
+        out, t_new = timed(pp.full_spellcheck, text, repeat=1)
+        _, t_memo = timed(pp.full_spellcheck, text, repeat=1)
+        spell_index._INDEX = None
+
+    ref, t_old = timed(_spellcheck_pyspellchecker, text, repeat=1)
+    ref_words, out_words = ref.split(), out.split()
+    same = sum(a == b for a, b in zip(ref_words, out_words))
+    print(f"[SPELL] {n_words} tokens, vocabulaire {vocab_size}")
+    print(f"  SpellChecker.correction : {t_old:.2f}s")
+    print(f"  index SymSpell          : {t_new:.2f}s (2e passage, mémo : {t_memo:.3f}s) ; "
+          f"construction {t_build:.1f}s une fois, ouverture mmap {t_open * 1000:.1f} ms")
+    print(f"  tokens identiques : {same}/{len(ref_words)} (écarts = égalités de fréquence départagées autrement)")
+
+
+# --- Vote OCR (align_pairwise / align_multiple) ---
+def _align_pairwise_difflib(seq1, seq2, gap_score=-2, match_score=2, mismatch_score=-1, min_ratio=0.8):
+    """Ancien chemin : tables en listes de listes, un SequenceMatcher par paire de phrases"""
+    from difflib import SequenceMatcher
+    n, m = len(seq1), len(seq2)
+    score = [[0] * (m+1) for _ in range(n+1)]
+    path = [[None] * (m+1) for _ in range(n+1)]
+    for i in range(1, n+1):
+        score[i][0] = score[i-1][0] + gap_score
+        path[i][0] = (i-1, 0)
+    for j in range(1, m+1):
+        score[0][j] = score[0][j-1] + gap_score
+        path[0][j] = (0, j-1)
+    for i in range(1, n+1):
+        for j in range(1, m+1):
+            sim = SequenceMatcher(None, seq1[i-1], seq2[j-1]).ratio()
+            s = match_score if sim >= min_ratio else mismatch_score
+            scores = [(score[i-1][j-1] + s, (i-1, j-1)),
+                      (score[i-1][j] + gap_score, (i-1, j)),
+                      (score[i][j-1] + gap_score, (i, j-1))]
+            score[i][j], path[i][j] = max(scores, key=lambda x: x[0])
+    i, j = n, m
+    aligned1, aligned2 = [], []
+    while i > 0 or j > 0:
+        pi, pj = path[i][j]
+        aligned1.append(seq1[i-1] if pi == i-1 else '')
+        aligned2.append(seq2[j-1] if pj == j-1 else '')
+        i, j = pi, pj
+    return aligned1[::-1], aligned2[::-1]
+
+def ocr_variants(rng, n_sentences, n_variants, vocab):
+    """Variantes OCR d'une même page : fautes de caractères, phrases perdues, ajoutées ou coupées"""
+    page = [" ".join(rng.choice(vocab) for _ in range(rng.randint(5, 25))).capitalize() + "."
+            for _ in range(n_sentences)]
+    variants = []
+    for _ in range(n_variants):
+        out = []
+        for sentence in page:
+            r = rng.random()
+            if r < 0.03:
+                continue
+            if r < 0.05:
+                out.append(random_word(rng, 2, 6) + " |")
+            words = [ocr_noise(rng, w) if rng.random() < 0.05 else w for w in sentence.split()]
+            if r > 0.98 and len(words) > 6:
+                out.extend([" ".join(words[:4]) + ".", " ".join(words[4:])])
+            else:
+                out.append(" ".join(words))
+        variants.append(out)
+    return page, variants
+
+def _align_multiple_collapse(texts):
+    """Ancien align_multiple : le consensus est revoté (deux candidats) après chaque alignement"""
+    aligned = texts[0]
+    for seq in texts[1:]:
+        a1, a2 = vote.align_pairwise(aligned, seq)
+        aligned = [vote.vote_column(cols, rover=False) for cols in zip(a1, a2)]
+    return aligned
+
+def bench_vote(n_sentences=200, n_variants=8, files=(), seed=0):
+    page = None
+    if files:
+        texts = []
+        for fname in files:
+            with open(fname, encoding="utf-8") as f:
+                texts.append([s.strip() for s in vote.split_sentences(f.read()) if s.strip()])
+        label = f"{len(files)} fichiers"
+    else:
+        rng = random.Random(seed)
+        page, texts = ocr_variants(rng, n_sentences, n_variants, [random_word(rng) for _ in range(3000)])
+        label = f"{n_variants} variantes synthétiques"
+    print(f"[VOTE] {label}, {sum(map(len, texts))} phrases ({len(texts[0])} × {len(texts[1])} pour la 1re paire)")
+
+    ref, t_old = timed(_align_pairwise_difflib, texts[0], texts[1], repeat=1)
+    out, t_new = timed(vote.align_pairwise, texts[0], texts[1])
+    print(f"  align_pairwise difflib : {t_old:.2f}s")
+    print(f"  align_pairwise NumPy   : {t_new:.3f}s (rapidfuzz : {vote.cdist is not None}) — identique : {out == ref}")
+
+    # Paires au seuil exact (ratio = 0.8, p. ex. « abc » / « ab ») : courtes phrases éditées caractère par caractère
+    rng = random.Random(seed)
+    cases = [(["abc"], ["ab"]), (["abc", "xyz"], ["ab", "xyz"])]
+    for _ in range(300):
+        base = [random_word(rng, 2, 12) for _ in range(rng.randint(1, 12))]
+        cases.append((base, [ocr_noise(rng, w) if rng.random() < 0.7 else w for w in base if rng.random() > 0.1]))
+    same = sum(vote.align_pairwise(a, b) == _align_pairwise_difflib(a, b) for a, b in cases)
+    banded = sum(vote.align_pairwise(a, b, band=max(len(a), len(b))) == _align_pairwise_difflib(a, b) for a, b in cases)
+    print(f"  cas limites : {same}/{len(cases)} identiques, {banded}/{len(cases)} en mode bande")
+
+    # Consensus : phrases exactes de la page retrouvées (variantes synthétiques seulement)
+    truth = Counter(page or ())
+    for label, fn in [("consensus revoté", _align_multiple_collapse),
+                      ("profil, sans ROVER", partial(vote.align_multiple, rover=False)),
+                      ("profil", vote.align_multiple),
+                      ("profil, bande 20", partial(vote.align_multiple, band=20)),
+                      ("profil, ancres", partial(vote.align_multiple, anchored=True))]:
+        out, t = timed(fn, texts, repeat=1)
+        score = f" — {sum((Counter(out) & truth).values())}/{len(page)} phrases de la page, {len(out)} en sortie" if page else ""
+        print(f"  align_multiple {label:20s}: {t:.2f}s{score}")
+
+# --- Doublons de phrases (remove_substring_duplicates) ---
+def _remove_duplicates_scan(phrases, min_overlap_ratio=0.7):
+    """Ancien chemin : chaque phrase comparée à toutes les phrases gardées, ensembles de mots recalculés"""
+    result = []
+    for phr in phrases:
+        for j, p in enumerate(result):
+            set1, set2 = set(phr.split()), set(p.split())
+            common = len(set1 & set2)
+            if common / max(1, len(set1)) > min_overlap_ratio or common / max(1, len(set2)) > min_overlap_ratio:
+                if len(phr) > len(p):
+                    result[j] = phr
+                break
+        else:
+            result.append(phr)
+    return result
+
+def bench_dedup(n_sentences=5000, seed=0):
+    rng = random.Random(seed)
+    # Consensus d'un long document : chaque phrase y revient parfois sous une autre forme OCR
+    _, (first, second) = ocr_variants(rng, n_sentences, 2, [random_word(rng) for _ in range(3000)])
+    phrases = first + rng.sample(second, len(second) // 5)
+    ref, t_old = timed(_remove_duplicates_scan, phrases, repeat=1)
+    out, t_new = timed(vote.remove_substring_duplicates, phrases)
+    print(f"[DEDUP] {len(phrases)} phrases → {len(out)}")
+    print(f"  comparaison à toutes les phrases gardées : {t_old:.2f}s")
+    print(f"  index inversé + préfixes rares           : {t_new:.3f}s — identique : {out == ref}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("mapping", help="correct_typo / apply_ocr_mapping avec un gros ocr_mapping.csv")
+    p.add_argument("--rules", type=int, default=5000)
+    p.add_argument("--words", type=int, default=50000)
+    p = sub.add_parser("lt", help="corriger_texte contre une ferme LanguageTool factice")
+    p.add_argument("--servers", type=int, default=8)
+    p.add_argument("--sentences", type=int, default=2000)
+    p = sub.add_parser("spell", help="full_spellcheck : SpellChecker.correction contre l'index SymSpell")
+    p.add_argument("--words", type=int, default=20000)
+    p.add_argument("--vocab", type=int, default=3000)
+    p = sub.add_parser("vote", help="align_pairwise / align_multiple : difflib contre NumPy")
+    p.add_argument("--sentences", type=int, default=200)
+    p.add_argument("--variants", type=int, default=8)
+    p.add_argument("files", nargs="*", help="variantes OCR réelles d'une même page (.txt)")
+    p = sub.add_parser("dedup", help="remove_substring_duplicates : comparaison exhaustive contre index inversé")
+    p.add_argument("--sentences", type=int, default=5000)
+    p = sub.add_parser("stub-lt", help="lance seulement les faux serveurs LanguageTool (Ctrl-C pour arrêter)")
+    p.add_argument("--ports", default="8010-8017")
+    args = ap.parse_args()
+
+    if args.bench == "mapping":
+        bench_mapping(args.rules, args.words)
+    elif args.bench == "lt":
+        bench_lt(args.servers, args.sentences)
+    elif args.bench == "spell":
+        bench_spell(args.words, args.vocab)
+    elif args.bench == "vote":
+        bench_vote(args.sentences, args.variants, args.files)
+    elif args.bench == "dedup":
+        bench_dedup(args.sentences)
+    elif args.bench == "stub-lt":
+        ports = parse_ports(args.ports)
+        start_stub_lt(ports)
+        print(f"🧪 Faux LanguageTool sur les ports {ports[0]}-{ports[-1]}")
+        threading.Event().wait()
+
+if __name__ == "__main__":
+    main()
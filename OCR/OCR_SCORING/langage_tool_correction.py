@@ -2,55 +2,83 @@
 import sys
 import os
 import re
-import language_tool_python
-import threading
-
-LT_PORTS = [8010, 8011, 8012, 8013, 8014, 8015, 8016, 8017]
-_next_port = [0]
-_port_lock = threading.Lock()
-
-def get_next_server_url():
-    with _port_lock:
-        idx = _next_port[0]
-        _next_port[0] = (_next_port[0] + 1) % len(LT_PORTS)
-    return f"http://localhost:{LT_PORTS[idx]}"
-
-def check_on_next_server(phrase):
-    url = get_next_server_url()
-    tool = language_tool_python.LanguageTool("fr", remote_server=url)
-    matches = tool.check(phrase)
-    return language_tool_python.utils.correct(phrase, matches)
-
-def corriger_texte(texte, lexique):
+import json
+from utils_regex import trie_regex
+from lt_client import LT_CHUNK_CHARS, get_lt_pool, apply_matches
+from lt_cache import get_lt_cache
+
+class LexiqueIndex:
+    """Index du lexique métier : minuscule → forme canonique + regex en arbre de préfixes.
+
+    La canonisation est linéaire en longueur de texte (un dict lookup par occurrence).
+    L'index peut être persisté à côté du dictionnaire et n'est reconstruit que si
+    celui-ci change (mtime/taille), le dictionnaire grossissant à chaque pipeline.
+    """
+    def __init__(self, termes=(), canon=None, pattern=None):
+        if canon is None:
+            canon = {}
+            for t in termes:
+                # En cas de doublon à la casse près, la première forme du lexique gagne
+                canon.setdefault(t.lower(), t)
+        self.canon = canon
+        if pattern is None and canon:
+            pattern = r'\b' + trie_regex(canon) + r'\b'
+        self.pattern = re.compile(pattern, flags=re.IGNORECASE) if pattern else None
+
+    def __len__(self):
+        return len(self.canon)
+
+    def canonicalize(self, texte):
+        if self.pattern is None:
+            return texte
+        canon = self.canon
+        return self.pattern.sub(lambda m: canon.get(m.group(0).lower(), m.group(0)), texte)
+
+    @classmethod
+    def load(cls, lexique_path, index_path=None):
+        """Charge l'index persisté s'il est à jour, sinon le reconstruit depuis le dictionnaire"""
+        index_path = index_path or lexique_path + ".index.json"
+        st = os.stat(lexique_path)
+        signature = f"{st.st_mtime_ns}:{st.st_size}"
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("signature") == signature:
+                return cls(canon=data["canon"], pattern=data["pattern"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with open(lexique_path, encoding='utf-8') as f:
+            index = cls([l.strip() for l in f if l.strip()])
+        try:
+            with open(index_path, "w", encoding='utf-8') as f:
+                json.dump({"signature": signature, "canon": index.canon,
+                           "pattern": index.pattern.pattern if index.pattern else None},
+                          f, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠️ Index du lexique non persisté : {e}")
+        return index
+
+def corriger_texte(texte, lexique, max_chars=LT_CHUNK_CHARS, workers=None, use_cache=True):
+    """Corrige le texte via la ferme LanguageTool puis applique le lexique métier.
+
+    Les phrases déjà vues (cache persistant, cf. lt_cache) ne sont pas renvoyées ; les autres
+    sont regroupées en blocs d'environ `max_chars` caractères (0 = une phrase par requête),
+    envoyés en parallèle sur tous les serveurs puis recollés dans l'ordre.
+    """
     # Découper en phrases pour éviter les blocages
-    phrases = re.split(r'(?<=[.!?])\s+', texte)
-    result = ""
-    # Préparer le pattern du lexique (OR de tous les termes)
-    pattern = None
-    if lexique:
-        pattern = re.compile(
-            r'\b(' + '|'.join(map(re.escape, lexique)) + r')\b',
-            flags=re.IGNORECASE
-        )
-
-    for phrase in phrases:
-        phrase = phrase.strip()
-        if not phrase:
-            continue
-
-        # 1) Corrections LanguageTool (round-robin)
-        corr = check_on_next_server(phrase)
-
-        # 2) Application du lexique métier
-        if pattern:
-            def repl(m):
-                # On retrouve le terme "canonique" dans lexique
-                return next(orig for orig in lexique if orig.lower() == m.group(0).lower())
-            corr = pattern.sub(repl, corr)
-
-        result += corr + " "
-
-    return result.strip()
+    phrases = [p.strip() for p in re.split(r'(?<=[.!?])\s+', texte) if p.strip()]
+    # Index du lexique métier (accepte aussi une simple liste de termes)
+    if not isinstance(lexique, LexiqueIndex):
+        lexique = LexiqueIndex(lexique or ())
+
+    # 1) Corrections LanguageTool (cache par phrase, blocs en parallèle, réponses dans l'ordre)
+    cache = get_lt_cache() if use_cache else None
+    matches = get_lt_pool().check_segments(phrases, "fr", max_chars=max_chars, workers=workers, cache=cache)
+    corrected = " ".join(apply_matches(p, m) if m else p for p, m in zip(phrases, matches))
+
+    # 2) Application du lexique métier
+    return lexique.canonicalize(corrected).strip()
 
 def main():
     # -->> ICI : on attend 2 arguments <input.txt> <output.txt>
@@ -62,16 +90,18 @@ def main():
     output_path = sys.argv[2]
 
     # Chargement du lexique métier (un terme par ligne, en minuscules)
-    lexique = []
+    lexique = LexiqueIndex()
     lexique_path = '/app/dico_juridique.txt'
     if os.path.exists(lexique_path):
-        with open(lexique_path, encoding='utf-8') as f:
-            lexique = [l.strip() for l in f if l.strip()]
+        lexique = LexiqueIndex.load(lexique_path)
 
     with open(input_path, "r", encoding="utf-8", errors="ignore") as fin:
         raw = fin.read()
 
     corrected = corriger_texte(raw, lexique)
+    get_lt_pool().report()
+    if get_lt_cache() is not None:
+        get_lt_cache().report()
 
     with open(output_path, "w", encoding="utf-8") as fout:
         fout.write(corrected)
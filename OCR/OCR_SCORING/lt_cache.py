@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Cache persistant des réponses LanguageTool, partagé entre processus (SQLite).
+
+Une entrée est adressée par le contenu : sha256(texte, langue, version de LT, paramètres
+de la requête, p. ex. enabledRules). Seuls les matches utiles (décalage, longueur,
+premières suggestions, règle) sont stockés. Les entrées les moins récemment utilisées
+sont évincées au-delà de `max_entries`.
+"""
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+
+LT_CACHE_PATH = os.environ.get("LT_CACHE_PATH", "/data/out/lt_cache.sqlite")  # "" = pas de cache
+LT_CACHE_MAX_ENTRIES = int(os.environ.get("LT_CACHE_MAX_ENTRIES", 200_000))
+LT_CACHE_FLUSH_SECONDS = 30   # dates d'utilisation et compteurs écrits au plus tard après ce délai
+LT_CACHE_FLUSH_TOUCHES = 5000  # ... ou dès que ce nombre de clés est en attente
+
+
+def cache_key(text, language, version, params=None):
+    payload = json.dumps([text, language, version, sorted((params or {}).items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def compact_matches(matches, max_replacements=3):
+    """Garde des matches LanguageTool ce dont ont besoin apply_matches et le log des corrections"""
+    return [{"offset": m["offset"], "length": m["length"],
+             "replacements": [{"value": r["value"]} for r in m.get("replacements", [])[:max_replacements]],
+             "rule": {"id": m.get("rule", {}).get("id")}}
+            for m in matches]
+
+
+class LTCache:
+    """Cache SQLite (mode WAL) : plusieurs processus peuvent lire et écrire en même temps.
+
+    Les compteurs hits/misses sont tenus par processus (stats()) et cumulés dans la base
+    (stats()["total_*"]) pour suivre le taux de réussite d'un lot complet.
+    Les lectures n'écrivent rien : dates d'utilisation et compteurs sont gardés en mémoire
+    et écrits par flush() (périodiquement, avec put_many, stats() et close()), pour ne pas
+    prendre le verrou d'écriture de SQLite à chaque recherche.
+    """
+
+    def __init__(self, path=LT_CACHE_PATH, max_entries=LT_CACHE_MAX_ENTRIES, timeout=30):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS lt_cache ("
+                              "key TEXT PRIMARY KEY, matches TEXT NOT NULL, last_used REAL NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS lt_cache_last_used ON lt_cache(last_used)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS lt_cache_stats (name TEXT PRIMARY KEY, value INTEGER)")
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._touched = {}   # clé -> dernière utilisation pas encore écrite
+        self._deltas = {}    # compteur -> incrément pas encore écrit dans lt_cache_stats
+        self._flushed = time.monotonic()
+
+    def get_many(self, keys):
+        """Renvoie {clé: matches} pour les clés présentes et rafraîchit leur date d'utilisation (différée)"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # Par paquets pour rester sous la limite de variables SQLite
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, matches FROM lt_cache WHERE key IN ({','.join('?' * len(part))})", part)
+                found.update((k, json.loads(m)) for k, m in rows)
+            now = time.time()
+            self._touched.update(dict.fromkeys(found, now))
+            self._bump(hits=len(found), misses=len(keys) - len(found))
+            if (len(self._touched) >= LT_CACHE_FLUSH_TOUCHES
+                    or time.monotonic() - self._flushed >= LT_CACHE_FLUSH_SECONDS):
+                with self.conn:
+                    self._flush()
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Enregistre {clé: matches} puis évince les entrées les plus anciennes si besoin"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self.conn:
+            # Dates en attente écrites d'abord : l'éviction doit voir les entrées récemment lues
+            self._flush()
+            self.conn.executemany("INSERT OR REPLACE INTO lt_cache (key, matches, last_used) VALUES (?, ?, ?)",
+                                  [(k, json.dumps(m, ensure_ascii=False), now) for k, m in items.items()])
+            self.counters["writes"] += len(items)
+            excess = self.conn.execute("SELECT COUNT(*) FROM lt_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute("DELETE FROM lt_cache WHERE key IN "
+                                  "(SELECT key FROM lt_cache ORDER BY last_used LIMIT ?)", (excess,))
+                self.counters["evicted"] += excess
+
+    def put(self, key, matches):
+        self.put_many({key: matches})
+
+    def _bump(self, **deltas):
+        for name, delta in deltas.items():
+            self.counters[name] += delta
+            if delta:
+                self._deltas[name] = self._deltas.get(name, 0) + delta
+
+    def _flush(self):
+        """Écrit les dates d'utilisation et compteurs en attente (verrou et transaction pris par l'appelant)"""
+        if self._touched:
+            self.conn.executemany("UPDATE lt_cache SET last_used = ? WHERE key = ?",
+                                  [(t, k) for k, t in self._touched.items()])
+        if self._deltas:
+            self.conn.executemany("INSERT INTO lt_cache_stats (name, value) VALUES (?, ?) "
+                                  "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                                  list(self._deltas.items()))
+        self._touched, self._deltas = {}, {}
+        self._flushed = time.monotonic()
+
+    def flush(self):
+        with self._lock, self.conn:
+            self._flush()
+
+    def stats(self):
+        with self._lock:
+            with self.conn:
+                self._flush()
+            c = dict(self.counters)
+            totals = dict(self.conn.execute("SELECT name, value FROM lt_cache_stats"))
+            c["entries"] = self.conn.execute("SELECT COUNT(*) FROM lt_cache").fetchone()[0]
+        lookups = c["hits"] + c["misses"]
+        c["hit_rate"] = c["hits"] / lookups if lookups else 0.0
+        c["total_hits"] = totals.get("hits", 0)
+        c["total_misses"] = totals.get("misses", 0)
+        total = c["total_hits"] + c["total_misses"]
+        c["total_hit_rate"] = c["total_hits"] / total if total else 0.0
+        return c
+
+    def report(self):
+        s = self.stats()
+        print(f"💾 Cache LanguageTool : {s['hits']}/{s['hits'] + s['misses']} trouvés ({s['hit_rate']:.0%}), "
+              f"cumul {s['total_hit_rate']:.0%} sur {s['total_hits'] + s['total_misses']} recherches, "
+              f"{s['entries']} entrées ({self.path})")
+        return s
+
+    def close(self):
+        with self._lock:
+            with self.conn:
+                self._flush()
+            self.conn.close()
+        atexit.unregister(self.flush)
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_lt_cache(path=None):
+    """Cache unique du processus ; None si désactivé (LT_CACHE_PATH="") ou impossible à ouvrir"""
+    global _CACHE
+    path = LT_CACHE_PATH if path is None else path
+    with _CACHE_LOCK:
+        if _CACHE is None and path:
+            try:
+                _CACHE = LTCache(path)
+                atexit.register(_CACHE.flush)
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache LanguageTool désactivé ({path}) : {e}")
+                _CACHE = False   # on ne retente pas à chaque appel
+        return _CACHE or None
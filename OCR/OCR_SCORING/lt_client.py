@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Client HTTP LanguageTool partagé : une session keep-alive par serveur de la ferme."""
+import time
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from lt_cache import cache_key, compact_matches
+
+LT_PORTS = [8010, 8011, 8012, 8013, 8014, 8015, 8016, 8017]
+LT_HOST = "http://localhost"
+LT_MAX_INFLIGHT = 2      # requêtes simultanées par serveur (JVM)
+LT_CHUNK_CHARS = 2000    # taille cible d'une requête /v2/check
+
+
+class LTClientPool:
+    """Pool de sessions LanguageTool créé une fois par processus.
+
+    Chaque port de LT_PORTS a sa propre requests.Session (connexion HTTP réutilisée).
+    Les serveurs sont vérifiés au démarrage (/v2/languages) ; un serveur qui échoue est
+    écarté puis revérifié quand plus aucun n'est disponible. Au plus `max_inflight`
+    requêtes sont en vol par serveur. Les compteurs de requêtes, d'erreurs, de latence
+    et de caractères envoyés sont exposés par stats()/report().
+    """
+
+    def __init__(self, ports=LT_PORTS, host=LT_HOST, timeout=10, health_timeout=2,
+                 max_inflight=LT_MAX_INFLIGHT):
+        self.urls = [f"{host}:{p}" for p in ports]
+        self.timeout = timeout
+        self.health_timeout = health_timeout
+        self.max_inflight = max_inflight
+        self.sessions = {}
+        self._slots = {}
+        for url in self.urls:
+            session = requests.Session()
+            # Une connexion keep-alive par requête en vol sur ce serveur
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max_inflight))
+            self.sessions[url] = session
+            self._slots[url] = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._version = None
+        self.healthy = []
+        self.counters = {"requests": 0, "errors": 0, "chars": 0, "latency_s": 0.0}
+        self._started = time.perf_counter()
+        self.health_check()
+
+    def health_check(self):
+        healthy = []
+        for url in self.urls:
+            try:
+                resp = self.sessions[url].get(f"{url}/v2/languages", timeout=self.health_timeout)
+                if resp.status_code == 200:
+                    healthy.append(url)
+            except requests.RequestException:
+                pass
+        with self._lock:
+            self.healthy = healthy
+        if not healthy:
+            print(f"⚠️ Aucun serveur LanguageTool joignable sur {self.urls}")
+        return healthy
+
+    def next_server(self):
+        """Serveur suivant en round-robin parmi les serveurs sains"""
+        with self._lock:
+            if not self.healthy:
+                return None
+            url = self.healthy[self._next % len(self.healthy)]
+            self._next += 1
+            return url
+
+    def _mark_down(self, url):
+        with self._lock:
+            if url in self.healthy:
+                self.healthy.remove(url)
+
+    def check(self, text, language="fr", **params):
+        """Renvoie la réponse JSON de /v2/check (bascule sur un autre serveur si besoin), None si échec"""
+        for attempt in range(2):
+            while True:
+                url = self.next_server()
+                if url is None:
+                    break
+                with self._slots[url]:
+                    t0 = time.perf_counter()
+                    try:
+                        resp = self.sessions[url].post(f"{url}/v2/check",
+                                                       data={"text": text, "language": language, **params},
+                                                       timeout=self.timeout)
+                        if resp.status_code >= 500:
+                            resp.raise_for_status()
+                    except requests.RequestException:
+                        # Connexion, timeout ou 5xx : c'est le serveur qui est en cause
+                        self._count(time.perf_counter() - t0, len(text), error=True)
+                        self._mark_down(url)
+                        continue
+                    # 4xx ou réponse illisible : c'est ce texte qui est en cause, le serveur reste sain
+                    try:
+                        resp.raise_for_status()
+                        result = resp.json()
+                    except (requests.RequestException, ValueError):
+                        self._count(time.perf_counter() - t0, len(text), error=True)
+                        return None
+                    self._count(time.perf_counter() - t0, len(text))
+                    return result
+            # Plus aucun serveur sain : on revérifie la ferme une seule fois
+            if attempt == 0 and not self.health_check():
+                break
+        return None
+
+    def version(self):
+        """Version du serveur LanguageTool (sondée une fois), utilisée dans les clés du cache"""
+        if self._version is None:
+            url = self.next_server()
+            if url is not None:
+                self._version = server_version(f"{url}/v2/check", self.sessions[url], self.health_timeout)
+        return self._version
+
+    def check_segments(self, segments, language="fr", max_chars=LT_CHUNK_CHARS, workers=None,
+                       cache=None, sep=" ", **params):
+        """Matches LanguageTool de chaque segment, décalages relatifs au segment.
+
+        Les segments déjà présents dans `cache` ne sont pas renvoyés au serveur ; les autres
+        sont regroupés en blocs (pack_groups), envoyés en parallèle, puis leurs matches
+        redistribués par segment et mis en cache. None pour un segment dont le bloc a échoué.
+        """
+        out = [None] * len(segments)
+        version = self.version() if cache is not None else None
+        keys = None
+        if version is not None:
+            keys = [cache_key(s, language, version, params) for s in segments]
+            hits = cache.get_many(keys)
+            for i, key in enumerate(keys):
+                out[i] = hits.get(key)
+
+        todo = [i for i, m in enumerate(out) if m is None]
+        groups = [[todo[j] for j in g] for g in pack_groups([len(segments[i]) for i in todo], max_chars, len(sep))]
+        results = self.check_many([sep.join(segments[i] for i in g) for g in groups], language, workers, **params)
+
+        new_entries = {}
+        for group, result in zip(groups, results):
+            if result is None:
+                continue
+            starts, pos = [], 0
+            for i in group:
+                starts.append(pos)
+                pos += len(segments[i]) + len(sep)
+            per_segment = {i: [] for i in group}
+            for match in compact_matches(result.get("matches", [])):
+                j = bisect_right(starts, match["offset"]) - 1
+                i, start = group[j], starts[j]
+                # Un match à cheval sur deux segments ne peut pas être rattaché à l'un d'eux
+                if match["offset"] + match["length"] > start + len(segments[i]):
+                    continue
+                match["offset"] -= start
+                per_segment[i].append(match)
+            for i, matches in per_segment.items():
+                out[i] = matches
+                if keys is not None:
+                    new_entries[keys[i]] = matches
+        if new_entries:
+            cache.put_many(new_entries)
+        return out
+
+    def check_many(self, texts, language="fr", workers=None, **params):
+        """Envoie les textes en parallèle sur toute la ferme ; les réponses reviennent dans l'ordre"""
+        workers = workers or max(1, len(self.healthy)) * self.max_inflight
+        if workers <= 1 or len(texts) <= 1:
+            return [self.check(t, language, **params) for t in texts]
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda t: self.check(t, language, **params), texts))
+
+    def _count(self, latency, chars, error=False):
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["latency_s"] += latency
+            self.counters["chars"] += chars
+            if error:
+                self.counters["errors"] += 1
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counters)
+        elapsed = time.perf_counter() - self._started
+        c["mean_latency_ms"] = 1000 * c["latency_s"] / c["requests"] if c["requests"] else 0.0
+        c["requests_per_s"] = c["requests"] / elapsed if elapsed else 0.0
+        c["chars_per_s"] = c["chars"] / elapsed if elapsed else 0.0
+        c["healthy_servers"] = len(self.healthy)
+        return c
+
+    def report(self):
+        s = self.stats()
+        print(f"📊 LanguageTool : {s['requests']} requêtes ({s['errors']} erreurs), "
+              f"latence moyenne {s['mean_latency_ms']:.0f} ms, {s['requests_per_s']:.1f} req/s, "
+              f"{s['chars_per_s']:.0f} caractères/s, {s['healthy_servers']}/{len(self.urls)} serveurs sains")
+        return s
+
+
+def server_version(check_url, session=requests, timeout=2):
+    """Version annoncée par un serveur LanguageTool (champ software de /v2/check), None si injoignable"""
+    try:
+        resp = session.post(check_url, data={"text": ".", "language": "fr"}, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()["software"]["version"]
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+
+def pack_groups(lengths, max_chars=LT_CHUNK_CHARS, sep_len=1):
+    """Indices d'éléments consécutifs regroupés en blocs d'au plus max_chars (un élément plus long reste seul)"""
+    groups, current, size = [], [], 0
+    for i, length in enumerate(lengths):
+        if current and size + sep_len + length > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        size += (sep_len if current else 0) + length
+        current.append(i)
+    if current:
+        groups.append(current)
+    return groups
+
+def pack_chunks(phrases, max_chars=LT_CHUNK_CHARS, sep=" "):
+    """Regroupe des phrases consécutives en blocs d'au plus max_chars (une phrase plus longue reste seule)"""
+    return [sep.join(phrases[i] for i in g) for g in pack_groups([len(p) for p in phrases], max_chars, len(sep))]
+
+
+def apply_matches(text, matches):
+    """Applique la première suggestion de chaque match en une passe (segments assemblés à la fin).
+
+    Les matches qui chevauchent une correction déjà retenue sont ignorés.
+    """
+    parts = []
+    pos = 0
+    for match in sorted(matches, key=lambda m: m["offset"]):
+        if not match.get("replacements"):
+            continue
+        start = match["offset"]
+        end = start + match["length"]
+        if start < pos:
+            continue
+        parts.append(text[pos:start])
+        parts.append(match["replacements"][0]["value"])
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_lt_pool(**kwargs):
+    """Pool LanguageTool unique du processus (créé au premier appel)"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = LTClientPool(**kwargs)
+        return _POOL
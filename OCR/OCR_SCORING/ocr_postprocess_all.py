@@ -1,10 +1,75 @@
 import sys
 import re
-import requests
-from collections import Counter
-from spellchecker import SpellChecker
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from glob import glob
+from collections import Counter, OrderedDict, namedtuple
 from pathlib import Path
+from functools import lru_cache
+import itertools
 import os
+import numpy as np
+from utils_regex import trie_regex
+from lt_cache import get_lt_cache
+from lt_client import LT_MAX_INFLIGHT, get_lt_pool, apply_matches
+from spell_index import get_spell_index
+
+# 0. Statistiques de caractères par ligne (purge, nettoyage, scores)
+# Classes de str.isalpha / isalnum / isdigit, et \w des regex (isalnum ou « _ »)
+CHAR_ALPHA, CHAR_ALNUM, CHAR_DIGIT, CHAR_WORD = 1, 2, 4, 8
+STATS_BATCH = 1000   # lignes comptées ensemble
+
+LineStats = namedtuple("LineStats", "length alpha alnum digit words")
+
+def _char_class(c):
+    return (CHAR_ALPHA * c.isalpha() | CHAR_ALNUM * c.isalnum() | CHAR_DIGIT * c.isdigit()
+            | CHAR_WORD * (c.isalnum() or c == "_"))
+
+@lru_cache(maxsize=1)
+def char_class_table():
+    """Classe de chaque caractère du plan multilingue de base (les autres sont classés à la volée)"""
+    return np.fromiter((_char_class(chr(i)) for i in range(0x10000)), dtype=np.uint8, count=0x10000)
+
+def line_stats(lines):
+    """Longueur, lettres, alphanumériques, chiffres et mots (\\w+) de chaque ligne, en une passe.
+
+    Les lignes sont encodées ensemble en UTF-32 : la classe de chaque caractère vient d'une
+    table, les comptes par ligne de sommes cumulées. Renvoie des tableaux NumPy (LineStats).
+    """
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    codes = np.frombuffer("".join(lines).encode("utf-32-le"), dtype=np.uint32)
+    classes = char_class_table()[np.minimum(codes, 0xFFFF)]
+    astral = np.flatnonzero(codes > 0xFFFF)
+    if astral.size:
+        classes[astral] = [_char_class(chr(c)) for c in codes[astral].tolist()]
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    def per_line(flags):
+        total = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+        return total[ends] - total[starts]
+
+    word = (classes & CHAR_WORD) != 0
+    # Début de mot : caractère de mot en début de ligne ou après un caractère qui n'en est pas un
+    word_start = word.copy()
+    word_start[1:] &= ~word[:-1]
+    first = starts[lengths > 0]
+    word_start[first] = word[first]
+    return LineStats(lengths, per_line((classes & CHAR_ALPHA) != 0), per_line((classes & CHAR_ALNUM) != 0),
+                     per_line((classes & CHAR_DIGIT) != 0), per_line(word_start))
+
+def batched(iterable, n=STATS_BATCH):
+    """Listes d'au plus n éléments consécutifs (itertools.batched n'existe qu'à partir de Python 3.12)"""
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
 
 # 1. Chargement d'un dictionnaire CSV externe pour le mapping OCR
 def load_mapping_from_csv(csv_path="ocr_mapping.csv"):
@@ -18,18 +83,35 @@ def load_mapping_from_csv(csv_path="ocr_mapping.csv"):
     return mapping
 
 # 2. Nettoyage typographique rapide
+# Règles caractère → chaîne appliquées en une passe C par str.translate
+TYPO_TABLE = str.maketrans({
+    "’": "'", "‘": "'",
+    "“": '"', "”": '"', "«": '"', "»": '"',
+    "…": "...",
+    "–": "-", "—": "-",
+})
+OE_REGEX = re.compile(r"\boe\b")
 def correct_typo(text):
-    rules = [
-        (r"[’‘]", "'"),
-        (r'[“”«»]', '"'),
-        (r'…', '...'),
-        (r'–|—', '-'),
-        (r'\boe\b', 'œ'),
-        (r'\s+', ' '),
-    ]
-    for pattern, repl in rules:
-        text = re.sub(pattern, repl, text)
-    return text.strip()
+    text = OE_REGEX.sub("œ", text.translate(TYPO_TABLE))
+    # Équivaut à re.sub(r'\s+', ' ', text).strip() (même définition Unicode des espaces)
+    return " ".join(text.split())
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+def typo_sentences(lines):
+    """correct_typo en flux : le texte normalisé (une seule ligne) découpé en phrases.
+
+    Une phrase se termine par un mot finissant par . ! ou ?, comme le découpage
+    de split_long_lines.
+    """
+    words = []
+    for line in lines:
+        for word in OE_REGEX.sub("œ", line.translate(TYPO_TABLE)).split():
+            words.append(word)
+            if word[-1] in ".!?":
+                yield " ".join(words)
+                words = []
+    if words:
+        yield " ".join(words)
 
 # 3. Mapping OCR courant (CSV + interne)
 DEFAULT_OCR_MAPPING = [
@@ -46,13 +128,57 @@ DEFAULT_OCR_MAPPING = [
     (r"\ba'il\b", "s'il"),
     (r"\ba'est-à-dire\b", "c'est-à-dire"),
 ]
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+class OcrRewriter:
+    """Mapping OCR compilé une fois : tous les mots littéraux en une seule regex + dict.
+
+    Les motifs `\bmot\b` et les chaînes littérales du CSV sont remplacés en une passe
+    (à position égale, le plus long gagne ; en cas de doublon, la première règle gagne).
+    Les rares motifs qui sont de vraies regex sont appliqués ensuite, un par un.
+    """
+    def __init__(self, mapping):
+        self.table = {}
+        bounded, free, self.regex_rules = [], [], []
+        for pattern, repl in mapping:
+            bare = pattern[2:-2] if pattern.startswith(r"\b") and pattern.endswith(r"\b") else None
+            if bare is not None and not REGEX_META & set(bare):
+                literal, group = bare, bounded
+            elif pattern and not REGEX_META & set(pattern):
+                literal, group = pattern, free
+            else:
+                if pattern:
+                    self.regex_rules.append((re.compile(pattern), repl))
+                continue
+            if literal not in self.table:
+                self.table[literal] = repl
+                group.append(literal)
+        alternatives = []
+        if bounded:
+            alternatives.append(r"\b" + trie_regex(bounded) + r"\b")
+        if free:
+            alternatives.append(trie_regex(free))
+        self.regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __call__(self, text):
+        if self.regex is not None:
+            table = self.table
+            text = self.regex.sub(lambda m: table[m.group(0)], text)
+        for regex, repl in self.regex_rules:
+            text = regex.sub(repl, text)
+        return text
+
+@lru_cache(maxsize=8)
+def get_ocr_rewriter(custom_mapping=()):
+    return OcrRewriter(DEFAULT_OCR_MAPPING + list(custom_mapping))
+
 def apply_ocr_mapping(text, custom_mapping=None):
-    mapping = DEFAULT_OCR_MAPPING.copy()
-    if custom_mapping:
-        mapping.extend(custom_mapping)
-    for pattern, repl in mapping:
-        text = re.sub(pattern, repl, text)
-    return text
+    return get_ocr_rewriter(tuple(custom_mapping or ()))(text)
+
+def ocr_mapping_stream(sentences, custom_mapping=None):
+    rewriter = get_ocr_rewriter(tuple(custom_mapping or ()))
+    for sentence in sentences:
+        yield rewriter(sentence)
 
 # 4. Bruit contextuel massif (menus, pubs, emails, HTML, signatures, @, etc.)
 BRUIT_PATTERNS = [
@@ -75,62 +201,133 @@ BRUIT_PATTERNS = [
     r"^\s*-+\s*$",  # lignes de tirets seuls
 ]
 BRUIT_REGEX = re.compile("|".join(BRUIT_PATTERNS), re.I)
+def purge_bruit_stream(lines, dropped_path=None, dropped_sink=None, stats=None):
+    """purge_bruit ligne à ligne ; les lignes supprimées sont écrites au fil de l'eau dans dropped_path.
+
+    dropped_sink (mode lot) reçoit à la place des listes de lignes supprimées.
+    Les comptes de caractères des lignes gardées alimentent stats (TextStats) sans nouveau passage.
+    """
+    kept = n_dropped = 0
+    dropped = open(dropped_path, "w", encoding="utf-8") if dropped_path and not dropped_sink else None
+    pending = []
+    try:
+        for batch in batched(line.strip() for line in lines):
+            batch = [line for line in batch if line]
+            counts = line_stats(batch)
+            for line_stripped, n_chars, n_alpha, n_words in zip(batch, counts.length.tolist(),
+                                                                counts.alpha.tolist(), counts.words.tolist()):
+                # Plus de 40% de caractères non alpha-numérique = probable bruit
+                ratio_alpha = n_alpha / (n_chars + 1e-5)
+                if ((ratio_alpha < 0.45 and n_chars > 16) or n_chars < 4
+                        or BRUIT_REGEX.search(line_stripped)):
+                    n_dropped += 1
+                    if dropped:
+                        dropped.write(line_stripped + "\n")
+                    elif dropped_sink:
+                        pending.append(line_stripped)
+                        if len(pending) >= 1000:
+                            dropped_sink(pending)
+                            pending = []
+                    continue
+                kept += 1
+                if stats is not None:
+                    stats.add_line(n_chars, n_words, n_alpha)
+                yield line_stripped
+    finally:
+        if dropped:
+            dropped.close()
+        if pending:
+            dropped_sink(pending)
+    print(f"Nombre de lignes après purge_bruit: {kept} (supprimées: {n_dropped})")
+
 def purge_bruit(text, dropped_path=None):
-    lines = text.splitlines()
-    cleaned, dropped = [], []
+    return "\n".join(purge_bruit_stream(text.splitlines(), dropped_path))
+
+
+# 5. Clean OCR + doublons + paragraphes bizarres + capitalisation automatique
+HYPHEN_JOIN = re.compile(r'(\w)-\s+(\w)')
+LONE_DASH = re.compile(r'(\s|^)-(\s|$)')
+
+class SeenSet:
+    """Ensemble compact pour le dédoublonnage : empreinte blake2b de 16 octets par paragraphe"""
+    def __init__(self):
+        self._digests = set()
+
+    def add_new(self, text):
+        """Ajoute text ; renvoie False s'il avait déjà été vu"""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+def _dash_blocks(lines):
+    """Regroupe les lignes en blocs qu'un tiret ne relie jamais entre eux (césure ou tiret isolé)"""
+    block, open_dash = [], False
     for line in lines:
-        line_stripped = line.strip()
-        if not line_stripped:
-            continue
-        # Plus de 40% de caractères non alpha-numérique = probable bruit
-        ratio_alpha = sum(c.isalpha() for c in line_stripped) / (len(line_stripped) + 1e-5)
-        if ratio_alpha < 0.45 and len(line_stripped) > 16:
-            dropped.append(line_stripped)
-            continue
-        if len(line_stripped) < 4:
-            dropped.append(line_stripped)
-            continue
-        if BRUIT_REGEX.search(line_stripped):
-            dropped.append(line_stripped)
+        if block and not open_dash and not line.startswith("-"):
+            yield "\n".join(block)
+            block = []
+        block.append(line)
+        if line.strip():
+            # Une ligne finissant par un tiret peut se recoller à la suivante (même après des lignes vides)
+            open_dash = line.rstrip().endswith("-")
+    if block:
+        yield "\n".join(block)
+
+def clean_ocr_stream(lines, stats=None):
+    """clean_ocr_text en flux : recolle les césures, redécoupe en phrases, capitalise, dédoublonne.
+
+    Seul l'ensemble des paragraphes déjà vus est global. Les paragraphes gardés sont
+    comptés dans stats (TextStats) au passage.
+    """
+    seen = SeenSet()
+    kept = 0
+    for batch in batched(_sentence_pieces(lines)):
+        counts = line_stats(batch)
+        for p, chars, alphanum, n_words, n_alpha in zip(batch, counts.length.tolist(), counts.alnum.tolist(),
+                                                        counts.words.tolist(), counts.alpha.tolist()):
+            if alphanum / chars < 0.5 and chars > 12:
+                continue  # bruit symboles
+            if chars < 5:
+                continue
+            if not seen.add_new(p):
+                continue
+            kept += 1
+            if stats is not None:
+                stats.add_line(chars, n_words, n_alpha)
+            yield p
+    print(f"Nombre de paragraphes restants: {kept}")
+
+def _sentence_pieces(lines):
+    """Phrases non vides de clean_ocr_stream, capitalisées, avant filtrage"""
+    first = True
+    carry = ""   # fin de texte pas encore terminée par . ! ?
+    for block in _dash_blocks(lines):
+        block = LONE_DASH.sub(' ', HYPHEN_JOIN.sub(r'\1\2', block))
+        flat = " ".join(l.strip() for l in block.split('\n') if l.strip())
+        if not flat:
             continue
-        cleaned.append(line_stripped)
-    print(f"Nombre de lignes après purge_bruit: {len(cleaned)} (supprimées: {len(dropped)})")
-    if dropped_path:
-        with open(dropped_path, "w", encoding="utf-8") as f:
-            for l in dropped:
-                f.write(l + "\n")
-    return "\n".join(cleaned)
+        pieces = SENTENCE_SPLIT.split(f"{carry} {flat}" if carry else flat)
+        carry = pieces.pop()
+        for p in pieces:
+            p = _capitalize(p, first)
+            first = False
+            if p:
+                yield p
+    if carry:
+        p = _capitalize(carry, first)
+        if p:
+            yield p
 
+def _capitalize(p, first):
+    # Capitalise la première lettre après . ! ?
+    if not first and 'a' <= p[:1] <= 'z':
+        p = p[0].upper() + p[1:]
+    return p.strip()
 
-# 5. Clean OCR + doublons + paragraphes bizarres + capitalisation automatique
 def clean_ocr_text(text):
-    text = re.sub(r'(\w)-\s+(\w)', r'\1\2', text)
-    text = re.sub(r'(\s|^)-(\s|$)', ' ', text)
-    lines = text.split('\n')
-    cleaned = [line.strip() for line in lines if line.strip()]
-    text = " ".join(cleaned)
-    text = re.sub(r'([.!?])\s+', r"\1\n", text)
-    # Capitalise la première lettre après . ! ?
-    text = re.sub(r'([.!?]\s+)([a-z])', lambda m: m.group(1) + m.group(2).upper(), text)
-    paragraphs = text.split('\n')
-    unique_paragraphs = []
-    seen = set()
-    for p in paragraphs:
-        p_stripped = p.strip()
-        if not p_stripped or p_stripped in seen:
-            continue
-        chars = len(p_stripped)
-        if chars == 0:
-            continue
-        alphanum = sum(c.isalnum() for c in p_stripped)
-        if alphanum / chars < 0.5 and chars > 12:
-            continue  # bruit symboles
-        if len(p_stripped) < 5:
-            continue
-        seen.add(p_stripped)
-        unique_paragraphs.append(p_stripped)
-    print(f"Nombre de paragraphes restants: {len(unique_paragraphs)}")
-    return "\n".join(unique_paragraphs)
+    return "\n".join(clean_ocr_stream(text.split('\n')))
 
 # 6. Détection mots rares (non stopwords, 1 occurrence)
 STOPWORDS = {
@@ -138,94 +335,208 @@ STOPWORDS = {
     "au", "pour", "par", "sur", "avec", "ou", "se", "ce", "il", "elle", "nous", "vous", "je", "tu", "ils", "elles",
     "son", "sa", "ses", "leur", "leurs", "plus", "a", "est", "que", "qui", "ne", "pas", "mais", "comme", "aussi"
 }
+class RareWordCounter:
+    """Fréquences des mots (minuscules) comptées au passage des paragraphes, pour detect_rare_words"""
+    def __init__(self):
+        self.freq = Counter()
+
+    def count(self, paragraphs):
+        for p in paragraphs:
+            self.freq.update(re.findall(r"\w+", p.lower()))
+            yield p
+
+    def rare(self, min_count=2, stopwords=STOPWORDS):
+        rare = {w for w, c in self.freq.items() if c < min_count and w not in stopwords}
+        print(f"Rare words trouvés: {sorted(rare)}")
+        return rare
+
 def detect_rare_words(text, min_count=2, stopwords=STOPWORDS):
-    words = re.findall(r"\w+", text.lower())
-    freq = Counter(words)
-    rare = {w for w, c in freq.items() if c < min_count and w not in stopwords}
-    print(f"Rare words trouvés: {sorted(rare)}")
-    return rare
+    counter = RareWordCounter()
+    counter.freq.update(re.findall(r"\w+", text.lower()))
+    return counter.rare(min_count, stopwords)
 
 # 7. Correction ortho simple (remplace par LanguageTool si possible)
-def full_spellcheck(text, rare_words_only=False, rare_words_set=None):
-    spell = SpellChecker(language='fr')
+def spellcheck_stream(paragraphs, rare_words_only=False, rare_words_set=None):
+    # Index SymSpell persisté (cf. spell_index), corrections mémoïsées par token
+    spell = get_spell_index()
     def repl(m):
         w = m.group(0)
         if rare_words_only and rare_words_set is not None and w.lower() not in rare_words_set:
             return w
         c = spell.correction(w)
         return c if c and c != w else w
-    return re.sub(r'\b\w+\b', repl, text)
+    for p in paragraphs:
+        yield re.sub(r'\b\w+\b', repl, p)
+
+def full_spellcheck(text, rare_words_only=False, rare_words_set=None):
+    return "\n".join(spellcheck_stream(text.split("\n"), rare_words_only, rare_words_set))
 
 # 8. Correction contextuelle LanguageTool + log auto-corrections pour mapping
-def correct_with_languagetool(text, api_url="http://localhost:8010/v2/check", language="fr", log_path=None):
-    import os
+LOGGED_MAX = 100_000   # corrections déjà loguées gardées en mémoire
+PONCTUATION_SEULE = {'.', ',', ';', ' ', '}', ']', '[', '{', ')', '('}
+
+class BoundedSet:
+    """Ensemble borné : au-delà de maxsize, les éléments les moins récemment vus sont oubliés"""
+    def __init__(self, maxsize=LOGGED_MAX):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __contains__(self, item):
+        if item in self._items:
+            self._items.move_to_end(item)
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        self._items[item] = None
+        self._items.move_to_end(item)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+# log_path -> (corrections déjà loguées, position lue dans le fichier)
+_LOGGED = {}
+
+def corrections_already_logged(log_path, maxsize=LOGGED_MAX):
+    """Corrections déjà présentes dans log_path, chargées une fois par processus.
+
+    Aux appels suivants, seules les lignes ajoutées depuis (par ce processus ou un autre)
+    sont lues.
+    """
+    seen, offset = _LOGGED.get(log_path, (None, 0))
+    if seen is None or (os.path.exists(log_path) and os.path.getsize(log_path) < offset):
+        seen, offset = BoundedSet(maxsize), 0
+    if os.path.exists(log_path):
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # ligne en cours d'écriture par un autre processus
+                seen.add(line.decode("utf-8", errors="ignore").strip())
+                offset += len(line)
+    _LOGGED[log_path] = (seen, offset)
+    return seen
+
+LT_BATCH_PARAGRAPHS = 500   # paragraphes envoyés ensemble à check_segments en mode flux
+
+def languagetool_stream(paragraphs, language="fr", log_path=None, use_cache=True, workers=None,
+                        batch_size=LT_BATCH_PARAGRAPHS, corrections_sink=None):
+    """Corrige les paragraphes via la ferme LanguageTool (cf. lt_client), par lots, et logue les corrections inédites.
+
+    Dans un lot, les paragraphes absents du cache sont regroupés en blocs et envoyés en
+    parallèle ; les suggestions sont appliquées en une passe (apply_matches).
+    Les corrections inédites sont ajoutées à log_path, ou passées à corrections_sink (mode lot).
+    """
+    if corrections_sink is None and log_path:
+        corrections_sink = lambda corrections: append_corrections(log_path, corrections)
+    # Corrections déjà loguées : on ne garde que les inédites
+    already_logged = corrections_already_logged(log_path) if log_path else BoundedSet()
+    cache = get_lt_cache() if use_cache else None
+    batch = []
+    for paragraph in paragraphs:
+        if paragraph.strip():
+            batch.append(paragraph)
+        if len(batch) >= batch_size:
+            yield from _languagetool_batch(batch, language, corrections_sink, already_logged, cache, workers)
+            batch = []
+    if batch:
+        yield from _languagetool_batch(batch, language, corrections_sink, already_logged, cache, workers)
+    if cache is not None:
+        cache.report()
+
+def _languagetool_batch(paragraphs, language, corrections_sink, already_logged, cache, workers):
+    # Paragraphes séparés par une ligne vide dans un bloc : LanguageTool les traite séparément
+    all_matches = get_lt_pool().check_segments(paragraphs, language, workers=workers, cache=cache, sep="\n\n")
     result_lines = []
     corrections_log = []
-    already_logged = set()
-    # Charge le fichier de log existant pour ne garder que les corrections inédites
-    if log_path and os.path.exists(log_path):
-        with open(log_path, encoding="utf-8") as f:
-            for line in f:
-                already_logged.add(line.strip())
-    for paragraph in text.split('\n'):
-        if not paragraph.strip():
-            continue
-        payload = {
-            "text": paragraph,
-            "language": language
-        }
-        try:
-            resp = requests.post(api_url, data=payload, timeout=10)
-            if resp.status_code == 200:
-                res = resp.json()
-                corrected = paragraph
-                matches = res.get('matches', [])
-                # 1. D'abord on log TOUTES les corrections inédites et pertinentes
-                for match in matches:
-                    if match['replacements']:
-                        orig = corrected[match['offset']:match['offset'] + match['length']].strip()
-                        replacement = match['replacements'][0]['value'].strip()
-                        # Filtre les cas inutiles
-                        if not orig or not replacement:
-                            continue
-                        if orig == replacement:
-                            continue
-                        if all(c in {'.', ',', ';', ' ', '}', ']', '[', '{', ')', '('} for c in orig):
-                            continue
-                        if all(c in {'.', ',', ';', ' ', '}', ']', '[', '{', ')', '('} for c in replacement):
-                            continue
-                        logline = f"{orig.lower()},{replacement.lower()}"
-                        if logline not in already_logged:
-                            corrections_log.append((orig, replacement))
-                            already_logged.add(logline)
-                # 2. Puis on applique les suggestions sur le texte (ordre inverse)
-                for match in sorted(matches, key=lambda m: m['offset'], reverse=True):
-                    if match['replacements']:
-                        start = match['offset']
-                        end = start + match['length']
-                        replacement = match['replacements'][0]['value']
-                        corrected = corrected[:start] + replacement + corrected[end:]
-                result_lines.append(corrected)
-            else:
-                result_lines.append(paragraph)
-        except Exception as e:
+    for paragraph, matches in zip(paragraphs, all_matches):
+        if not matches:
             result_lines.append(paragraph)
+            continue
+        # 1. D'abord on log TOUTES les corrections inédites et pertinentes
+        for match in matches:
+            if match['replacements']:
+                orig = paragraph[match['offset']:match['offset'] + match['length']].strip()
+                replacement = match['replacements'][0]['value'].strip()
+                # Filtre les cas inutiles
+                if not orig or not replacement:
+                    continue
+                if orig == replacement:
+                    continue
+                if all(c in PONCTUATION_SEULE for c in orig):
+                    continue
+                if all(c in PONCTUATION_SEULE for c in replacement):
+                    continue
+                logline = f"{orig.lower()},{replacement.lower()}"
+                if logline not in already_logged:
+                    corrections_log.append((orig, replacement))
+                    already_logged.add(logline)
+        # 2. Puis on applique les suggestions sur le texte, en une passe
+        result_lines.append(apply_matches(paragraph, matches))
+    if corrections_sink and corrections_log:
+        corrections_sink(corrections_log)
+    return result_lines
+
+def append_corrections(log_path, corrections):
     # Toujours append (et pas écraser) les corrections inédites
-    if log_path and corrections_log:
-        with open(log_path, "a", encoding="utf-8") as f:  # append mode
-            for orig, rep in corrections_log:
-                f.write(f"{orig},{rep}\n")
-    return "\n".join(result_lines)
+    with open(log_path, "a", encoding="utf-8") as f:  # append mode
+        f.write("".join(f"{orig},{rep}\n" for orig, rep in corrections))
+
+def correct_with_languagetool(text, language="fr", log_path=None, use_cache=True, workers=None):
+    return "\n".join(languagetool_stream(text.split('\n'), language, log_path, use_cache, workers,
+                                         batch_size=sys.maxsize))
 
 
 # 9. Scoring global du fichier (qualité brute)
+class TextStats:
+    """Compteurs de compute_text_stats alimentés au fil du flux (texte = lignes jointes par \\n)"""
+    def __init__(self):
+        self.chars = self.words = self.lines = self.alpha = 0
+
+    def add(self, text, lines=1):
+        counts = line_stats([text])
+        self.chars += len(text)
+        self.lines += lines
+        self.words += int(counts.words[0])
+        self.alpha += int(counts.alpha[0])
+
+    def add_line(self, chars, words, alpha):
+        """Ligne déjà comptée par line_stats (purge, nettoyage)"""
+        if self.lines:
+            self.chars += 1   # le \n qui sépare les lignes
+        self.chars += chars
+        self.words += words
+        self.alpha += alpha
+        self.lines += 1
+
+    def count_raw(self, lines):
+        """Lignes brutes d'un fichier (fins de ligne comprises)"""
+        for batch in batched(lines):
+            counts = line_stats(batch)
+            self.chars += int(counts.length.sum())
+            self.words += int(counts.words.sum())
+            self.alpha += int(counts.alpha.sum())
+            self.lines += sum(len(line.splitlines()) for line in batch)
+            yield from batch
+
+    def count(self, lines):
+        for batch in batched(lines):
+            counts = line_stats(batch)
+            for chars, words, alpha in zip(counts.length.tolist(), counts.words.tolist(), counts.alpha.tolist()):
+                self.add_line(chars, words, alpha)
+            yield from batch
+
+    def report(self):
+        chars, alpha = self.chars, self.alpha
+        print(f"Score: {chars} chars, {self.words} mots, {self.lines} lignes, {alpha/chars if chars else 0:.2%} lettres alpha")
+        return {"chars": chars, "words": self.words, "lines": self.lines, "alpha_ratio": alpha/chars if chars else 0}
+
 def compute_text_stats(text):
-    chars = len(text)
-    words = len(re.findall(r'\w+', text))
-    lines = len(text.splitlines())
-    alpha = sum(c.isalpha() for c in text)
-    print(f"Score: {chars} chars, {words} mots, {lines} lignes, {alpha/chars if chars else 0:.2%} lettres alpha")
-    return {"chars": chars, "words": words, "lines": lines, "alpha_ratio": alpha/chars if chars else 0}
+    stats = TextStats()
+    stats.add(text, len(text.splitlines()))
+    return stats.report()
 
 def split_long_lines(text, maxlen=800):
     """Découpe les lignes trop longues en phrases pour éviter de tout perdre à l'étape purge."""
@@ -239,75 +550,351 @@ def split_long_lines(text, maxlen=800):
             out.append(l)
     return "\n".join([s for s in out if s.strip()])
 
+def split_long_stream(sentences, maxlen=800):
+    """split_long_lines en flux sur la sortie (une seule ligne, en phrases) de typo_sentences.
+
+    Tant que le texte ne dépasse pas maxlen, les phrases sont retenues : un texte court
+    reste une seule ligne, un texte long est découpé en phrases.
+    """
+    it = iter(sentences)
+    held, size = [], -1
+    for sentence in it:
+        held.append(sentence)
+        size += len(sentence) + 1
+        if size > maxlen:
+            break
+    else:
+        line = " ".join(held).strip()
+        if line:
+            yield line
+        return
+    for sentence in itertools.chain(held, it):
+        for s in SENTENCE_SPLIT.split(sentence):
+            if s.strip():
+                yield s
+
+def head_log(lines, n=10):
+    """Affiche les n premières lignes pour debug rapide"""
+    for i, line in enumerate(lines):
+        if i < n:
+            print(f"Ligne {i} : {len(line)} caractères : {repr(line[:100])}")
+        yield line
+
 # Dédoublonnage global (après tout)
+def deduplicate_stream(lines):
+    seen = SeenSet()
+    for line in lines:
+        for l in line.split('\n'):
+            s = l.strip()
+            if s and seen.add_new(s):
+                yield s
+
 def deduplicate_paragraphs(text):
-    lines = text.split('\n')
-    seen = set()
-    result = []
-    for l in lines:
-        s = l.strip()
-        if not s or s in seen:
-            continue
-        seen.add(s)
-        result.append(s)
-    return "\n".join(result)
+    return "\n".join(deduplicate_stream([text]))
 
 # 10. Main workflow
-def main():
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input_file")
-    parser.add_argument("output_file")
-    parser.add_argument("--only_rare", action="store_true")
-    parser.add_argument("--languagetool", action="store_true")
-    parser.add_argument("--mapping", default="/data/out/ocr_mapping.csv")
-    parser.add_argument("--log_corrections", default="/data/out/corrections_languagetool.csv")
-    parser.add_argument("--dropped_lines", default="/data/out/dropped_lines.txt")
-    args = parser.parse_args()
+def postprocess_file(input_file, output_file, languagetool=False, only_rare=False,
+                     mapping_path="/data/out/ocr_mapping.csv",
+                     log_corrections="/data/out/corrections_languagetool.csv",
+                     dropped_lines="/data/out/dropped_lines.txt",
+                     custom_mapping=None, dropped_sink=None, corrections_sink=None):
+    """Enchaîne toutes les étapes en flux, paragraphe par paragraphe, de input_file à output_file.
 
-    print(f"Lecture fichier : {args.input_file}")
-    with open(args.input_file, encoding="utf-8") as f:
-        text = f.read()
-    compute_text_stats(text)
+    Seuls le dédoublonnage (empreintes) et les fréquences de mots restent en mémoire ;
+    avec only_rare, la correction attend la liste complète des mots rares et les
+    paragraphes nettoyés passent par un fichier temporaire. En mode lot, le mapping est
+    déjà chargé et les logs partagés passent par dropped_sink / corrections_sink.
+    """
+    print(f"Lecture fichier : {input_file}")
+    raw_stats, purged_stats, clean_stats, final_stats = TextStats(), TextStats(), TextStats(), TextStats()
+    words = RareWordCounter()
+    if custom_mapping is None:
+        custom_mapping = load_mapping_from_csv(mapping_path)
+    rare_path = output_file.replace('.txt', '_rare.txt')
+    rare = None
+    sample = ""
 
-    text = correct_typo(text)
-    custom_mapping = load_mapping_from_csv(args.mapping)
-    text = apply_ocr_mapping(text, custom_mapping)
-    text = split_long_lines(text, maxlen=1000)  # NOUVEAU !
-    lines = text.splitlines()
-    for i, line in enumerate(lines[:10]):  # log que les 10 premières pour debug rapide
-        print(f"Ligne {i} : {len(line)} caractères : {repr(line[:100])}")
+    with open(input_file, encoding="utf-8") as fin, \
+            tempfile.TemporaryFile("w+", encoding="utf-8", newline="\n") as spool:
+        paragraphs = typo_sentences(raw_stats.count_raw(fin))
+        paragraphs = ocr_mapping_stream(paragraphs, custom_mapping)
+        paragraphs = head_log(split_long_stream(paragraphs, maxlen=1000))
+        paragraphs = purge_bruit_stream(paragraphs, dropped_path=dropped_lines, dropped_sink=dropped_sink,
+                                        stats=purged_stats)
+        paragraphs = words.count(clean_ocr_stream(paragraphs, stats=clean_stats))
 
-    text = purge_bruit(text, dropped_path=args.dropped_lines)
-    compute_text_stats(text)
+        if only_rare and not languagetool:
+            # La correction a besoin de tous les mots rares : on termine d'abord les étapes amont
+            spool.writelines(p + "\n" for p in paragraphs)
+            spool.seek(0)
+            paragraphs = (line[:-1] for line in spool)
+            rare = words.rare()
 
-    text = clean_ocr_text(text)
-    compute_text_stats(text)
-
-    rare = detect_rare_words(text)
-    with open(args.output_file.replace('.txt', '_rare.txt'), "w", encoding="utf-8") as f:
-        f.write("\n".join(sorted(rare)))
+        if languagetool:
+            print("→ Correction contextuelle LanguageTool...")
+            corrected = languagetool_stream(paragraphs, log_path=log_corrections,
+                                            corrections_sink=corrections_sink)
+        else:
+            corrected = spellcheck_stream(paragraphs, rare_words_only=only_rare,
+                                          rare_words_set=rare if only_rare else None)
 
-    if args.languagetool:
-        print("→ Correction contextuelle LanguageTool...")
-        text_corr = correct_with_languagetool(text, log_path=args.log_corrections)
-    else:
-        text_corr = full_spellcheck(text, rare_words_only=args.only_rare, rare_words_set=rare if args.only_rare else None)
+        with open(output_file, "w", encoding="utf-8") as fout:
+            for i, p in enumerate(final_stats.count(deduplicate_stream(corrected))):
+                line = f"\n{p}" if i else p
+                fout.write(line)
+                if len(sample) < 800:
+                    sample = (sample + line)[:800]
 
-    text_corr = deduplicate_paragraphs(text_corr)
+    if rare is None:
+        rare = words.rare()
+    with open(rare_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(sorted(rare)))
 
-    compute_text_stats(text_corr)
-    with open(args.output_file, "w", encoding="utf-8") as f:
-        f.write(text_corr)
+    for stats in (raw_stats, purged_stats, clean_stats):
+        stats.report()
+    final = final_stats.report()
+    if languagetool:
+        get_lt_pool().report()
 
     print("=== Echantillon du texte nettoyé :")
-    print(text_corr[:800])
-    print(f"✅ Fichier propre : {args.output_file}")
-    print(f"({len(rare)} mots rares enregistrés dans {args.output_file.replace('.txt', '_rare.txt')})")
+    print(sample)
+    print(f"✅ Fichier propre : {output_file}")
+    print(f"({len(rare)} mots rares enregistrés dans {rare_path})")
 
     # Log warning si texte final très court (piège de purge trop agressive)
-    if len(text_corr) < 800:
+    if final["chars"] < 800:
         print("⚠️ Texte final très court, vérifie la configuration des motifs de bruit !")
+    return final
+
+# 11. Mode lot : un pool de processus longue durée pour tout un dossier / manifeste
+class LogWriter(threading.Thread):
+    """Seul écrivain des logs partagés (lignes supprimées, corrections LanguageTool) en mode lot.
+
+    Les workers envoient leurs lignes dans une file ; les corrections sont dédoublonnées
+    ici, ce qui évite que deux fichiers traités en même temps loguent la même.
+    """
+    def __init__(self, queue, dropped_path=None, log_path=None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.dropped_path = dropped_path
+        self.log_path = log_path
+        self.counts = {"dropped": 0, "corrections": 0}
+
+    def run(self):
+        dropped = open(self.dropped_path, "w", encoding="utf-8") if self.dropped_path else None
+        already_logged = corrections_already_logged(self.log_path) if self.log_path else BoundedSet()
+        try:
+            while (msg := self.queue.get()) is not None:
+                kind, payload = msg
+                if kind == "dropped" and dropped:
+                    dropped.write("".join(l + "\n" for l in payload))
+                    self.counts["dropped"] += len(payload)
+                elif kind == "corrections" and self.log_path:
+                    new = []
+                    for orig, rep in payload:
+                        logline = f"{orig.lower()},{rep.lower()}"
+                        if logline not in already_logged:
+                            already_logged.add(logline)
+                            new.append((orig, rep))
+                    if new:
+                        append_corrections(self.log_path, new)
+                        self.counts["corrections"] += len(new)
+        finally:
+            if dropped:
+                dropped.close()
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+# État d'un worker du mode lot (chargé une fois par _init_batch_worker)
+_WORKER = {}
+
+def _init_batch_worker(queue, mapping_path, languagetool, log_corrections, lt_inflight=LT_MAX_INFLIGHT):
+    _WORKER["queue"] = queue
+    _WORKER["mapping"] = load_mapping_from_csv(mapping_path)
+    get_ocr_rewriter(tuple(_WORKER["mapping"]))   # compile les regex du mapping
+    if languagetool:
+        get_lt_pool(max_inflight=lt_inflight)
+        get_lt_cache()
+        if log_corrections:
+            corrections_already_logged(log_corrections)
+    else:
+        get_spell_index()
+
+def _postprocess_one(task):
+    input_file, output_file, options = task
+    queue = _WORKER["queue"]
+    t0 = time.perf_counter()
+    # La sortie console de chaque fichier va dans son propre log, à côté du fichier propre
+    log_file = os.path.splitext(output_file)[0] + "_postprocess.log"
+    try:
+        with open(log_file, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+            stats = postprocess_file(input_file, output_file, custom_mapping=_WORKER["mapping"],
+                                     dropped_sink=lambda lines: queue.put(("dropped", lines)),
+                                     corrections_sink=lambda corr: queue.put(("corrections", corr)),
+                                     **options)
+        return {"file": input_file, "output": output_file, "chars": stats["chars"],
+                "seconds": round(time.perf_counter() - t0, 3), "error": None}
+    except Exception as e:
+        return {"file": input_file, "output": output_file, "chars": 0,
+                "seconds": round(time.perf_counter() - t0, 3), "error": f"{type(e).__name__}: {e}"}
+
+def batch_tasks(input_dir=None, pattern="*.txt", output_dir=None, manifest=None, exclude=()):
+    """(entrée, sortie) à traiter : lignes « entrée[<tab>sortie] » du manifeste, ou fichiers du dossier.
+
+    Sans sortie explicite : <output_dir ou dossier de l'entrée>/<nom>_clean.txt.
+    Les sorties d'un passage précédent et les logs partagés (`exclude`) ne sont pas repris.
+    """
+    exclude = {os.path.abspath(p) for p in exclude if p}
+    pairs = []
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    src, _, dst = line.partition("\t")
+                    pairs.append((src, dst or None))
+    else:
+        pairs = [(src, None) for src in sorted(glob(os.path.join(input_dir, pattern)))
+                 if not src.endswith(("_clean.txt", "_rare.txt", "_postprocess.log"))
+                 and os.path.abspath(src) not in exclude]
+    tasks = []
+    for src, dst in pairs:
+        if not dst:
+            stem = os.path.splitext(os.path.basename(src))[0]
+            dst = os.path.join(output_dir or os.path.dirname(src), stem + "_clean.txt")
+        tasks.append((src, dst))
+    return tasks
+
+def postprocess_batch(tasks, workers=1, force=False, summary_path=None, languagetool=False, only_rare=False,
+                      mapping_path="/data/out/ocr_mapping.csv",
+                      log_corrections="/data/out/corrections_languagetool.csv",
+                      dropped_lines="/data/out/dropped_lines.txt"):
+    """Post-traite une liste de (entrée, sortie) dans un pool de processus longue durée.
+
+    Chaque worker charge une fois le mapping, les regex, l'index orthographique ou le
+    client LanguageTool ; les logs partagés sont écrits par un seul LogWriter.
+    Les sorties plus récentes que leur entrée sont sautées (sauf `force`).
+    Avec LanguageTool, LT_MAX_INFLIGHT est une limite globale par serveur : elle est répartie
+    entre les workers, dont le nombre est plafonné à LT_MAX_INFLIGHT.
+    """
+    todo, skipped = [], []
+    options = {"languagetool": languagetool, "only_rare": only_rare,
+               "log_corrections": log_corrections, "dropped_lines": None}
+    for src, dst in tasks:
+        if not force and os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            skipped.append(src)
+            continue
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        todo.append((src, dst, options))
+    lt_inflight = LT_MAX_INFLIGHT
+    if languagetool and workers > 1:
+        # Chaque processus a son propre pool LT : sans plafond, un serveur recevrait workers × LT_MAX_INFLIGHT
+        # requêtes, les timeouts l'écarteraient et des paragraphes resteraient sans correction
+        if workers > LT_MAX_INFLIGHT:
+            print(f"⚠️ LanguageTool : workers plafonnés à {LT_MAX_INFLIGHT} (au lieu de {workers}), "
+                  f"{LT_MAX_INFLIGHT} requêtes en vol au plus par serveur")
+            workers = LT_MAX_INFLIGHT
+        lt_inflight = max(1, LT_MAX_INFLIGHT // workers)
+    print(f"📁 {len(todo)} fichiers à post-traiter, {len(skipped)} déjà à jour | workers: {workers}")
+
+    if not languagetool and todo:
+        # Index construit (et écrit) une seule fois ici s'il manque : les workers ne font que l'ouvrir en mmap
+        get_spell_index()
+
+    # spawn : le LogWriter tourne déjà dans un thread du processus parent
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    writer = LogWriter(queue, dropped_lines, log_corrections if languagetool else None)
+    writer.start()
+    initargs = (queue, mapping_path, languagetool, log_corrections, lt_inflight)
+    results = []
+    t0 = time.perf_counter()
+
+    def report(r):
+        results.append(r)
+        status = f"❌ {r['error']}" if r["error"] else f"{r['chars']} caractères"
+        print(f"📈 [{len(results)}/{len(todo)}] {os.path.basename(r['file'])} en {r['seconds']:.2f}s — {status}")
+
+    try:
+        if workers <= 1:
+            _init_batch_worker(*initargs)
+            for t in todo:
+                report(_postprocess_one(t))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_batch_worker,
+                                     initargs=initargs) as ex:
+                futures = {ex.submit(_postprocess_one, t): t for t in todo}
+                for fut in as_completed(futures):
+                    try:
+                        report(fut.result())
+                    except BrokenProcessPool as e:
+                        # Worker tué (OOM, plantage natif) : le fichier est noté en échec, le lot continue
+                        src, dst, _ = futures[fut]
+                        report({"file": src, "output": dst, "chars": 0, "seconds": 0.0,
+                                "error": f"{type(e).__name__}: {e}"})
+    finally:
+        writer.stop()
+        # Résumé toujours écrit, même si le lot est interrompu : les fichiers restants sont notés en échec
+        total_s = time.perf_counter() - t0
+        done = {r["file"] for r in results}
+        results.extend({"file": src, "output": dst, "chars": 0, "seconds": 0.0, "error": "interrompu"}
+                       for src, dst, _ in todo if src not in done)
+        results.sort(key=lambda r: r["file"])
+        failures = [r for r in results if r["error"]]
+        summary = {
+            "processed": len(results) - len(failures),
+            "skipped": skipped,
+            "failed": len(failures),
+            "seconds": round(total_s, 3),
+            "dropped_lines": writer.counts["dropped"],
+            "new_corrections": writer.counts["corrections"],
+            "files": results,
+        }
+        if summary_path:
+            with open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+    if languagetool and workers <= 1:
+        get_lt_pool().report()
+    print(f"✅ {summary['processed']} fichiers propres en {total_s:.1f}s, {summary['failed']} échecs"
+          + (f" → {summary_path}" if summary_path else ""))
+    return summary
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_file", nargs="?")
+    parser.add_argument("output_file", nargs="?")
+    parser.add_argument("--only_rare", action="store_true")
+    parser.add_argument("--languagetool", action="store_true")
+    parser.add_argument("--mapping", default="/data/out/ocr_mapping.csv")
+    parser.add_argument("--log_corrections", default="/data/out/corrections_languagetool.csv")
+    parser.add_argument("--dropped_lines", default="/data/out/dropped_lines.txt")
+    # Mode lot
+    parser.add_argument("--input_dir", default=None, help="post-traite tous les fichiers du dossier")
+    parser.add_argument("--pattern", default="*.txt", help="fichiers retenus dans --input_dir")
+    parser.add_argument("--manifest", default=None, help="une ligne « entrée[<tab>sortie] » par fichier")
+    parser.add_argument("--output_dir", default=None, help="dossier des sorties (défaut : à côté des entrées)")
+    parser.add_argument("--workers", type=int, default=0, help="nombre de processus (0 = tous les cœurs)")
+    parser.add_argument("--force", action="store_true", help="retraiter même les sorties déjà à jour")
+    parser.add_argument("--summary", default=None, help="résumé JSON du lot")
+    args = parser.parse_args()
+
+    if args.input_dir or args.manifest:
+        tasks = batch_tasks(args.input_dir, args.pattern, args.output_dir, args.manifest,
+                            exclude=(args.log_corrections, args.dropped_lines, args.summary))
+        postprocess_batch(tasks, workers=args.workers or os.cpu_count() or 1, force=args.force,
+                          summary_path=args.summary, languagetool=args.languagetool,
+                          only_rare=args.only_rare, mapping_path=args.mapping,
+                          log_corrections=args.log_corrections, dropped_lines=args.dropped_lines)
+        return
+    if not (args.input_file and args.output_file):
+        parser.error("input_file et output_file sont requis hors mode lot (--input_dir / --manifest)")
+
+    postprocess_file(args.input_file, args.output_file, languagetool=args.languagetool,
+                     only_rare=args.only_rare, mapping_path=args.mapping,
+                     log_corrections=args.log_corrections, dropped_lines=args.dropped_lines)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Correction orthographique par suppressions symétriques (à la SymSpell).
+
+L'index est construit une fois à partir du dictionnaire français de pyspellchecker et
+du lexique juridique : chaque mot et toutes ses variantes à au plus `max_distance`
+suppressions sont hachés (blake2b 64 bits), triés et écrits en .npy à côté des
+fréquences et des mots. Au démarrage les tableaux sont ouverts en mmap, partagés
+entre processus par le cache disque. Une correction coûte quelques recherches
+dichotomiques ; les tokens déjà vus sont mémoïsés.
+
+Les choix de SpellChecker.correction sont reproduits : mot connu inchangé, candidats
+à distance 1 avant distance 2, préférence pour les variantes d'accents, puis fréquence.
+"""
+import os
+import json
+import string
+import hashlib
+import threading
+import unicodedata
+from functools import lru_cache
+import numpy as np
+
+SPELL_INDEX_DIR = os.environ.get("SPELL_INDEX_DIR", "/data/out/spell_index_fr")
+SPELL_LEXIQUE_PATH = "/app/dico_juridique.txt"
+SPELL_MAX_DISTANCE = 2
+SPELL_MEMO_SIZE = 1 << 18   # tokens mémoïsés par processus
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def deletes(word, max_distance=SPELL_MAX_DISTANCE):
+    """word et toutes ses variantes obtenues par au plus max_distance suppressions"""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+def osa_distance(a, b, max_distance=SPELL_MAX_DISTANCE):
+    """Distance d'édition avec transpositions adjacentes ; max_distance + 1 dès qu'elle est dépassée"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+def _remove_diacritics(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def french_frequencies(lexique_path=SPELL_LEXIQUE_PATH):
+    """Fréquences du dictionnaire français de pyspellchecker + mots du lexique juridique"""
+    from spellchecker import SpellChecker
+    freq = dict(SpellChecker(language='fr').word_frequency.dictionary)
+    if lexique_path and os.path.exists(lexique_path):
+        with open(lexique_path, encoding="utf-8") as f:
+            for line in f:
+                for w in line.lower().split():
+                    freq.setdefault(w, 1)
+    return freq
+
+def index_signature(lexique_path=SPELL_LEXIQUE_PATH, max_distance=SPELL_MAX_DISTANCE):
+    import spellchecker
+    lex = None
+    if lexique_path and os.path.exists(lexique_path):
+        st = os.stat(lexique_path)
+        lex = [lexique_path, st.st_mtime_ns, st.st_size]
+    return json.dumps({"pyspellchecker": spellchecker.__version__, "lexique": lex,
+                       "max_distance": max_distance})
+
+
+class SpellIndex:
+    """Index de suppressions : hachés triés → identifiants de mots, fréquences et mots en tableaux."""
+
+    FILES = ("hashes", "ids", "freqs", "offsets", "blob")
+
+    def __init__(self, hashes, ids, freqs, offsets, blob, longest, max_distance=SPELL_MAX_DISTANCE):
+        self.hashes, self.ids, self.freqs = hashes, ids, freqs
+        self.offsets, self.blob = offsets, blob
+        self.longest = longest   # longueur du plus long mot, en caractères
+        self.max_distance = max_distance
+        self.correction = lru_cache(maxsize=SPELL_MEMO_SIZE)(self._correction)
+
+    def __len__(self):
+        return len(self.freqs)
+
+    @classmethod
+    def build(cls, frequencies, max_distance=SPELL_MAX_DISTANCE):
+        words = sorted(frequencies)
+        hashes, ids = [], []
+        for i, w in enumerate(words):
+            for d in deletes(w, max_distance):
+                hashes.append(_hash(d))
+                ids.append(i)
+        hashes = np.array(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        encoded = [w.encode("utf-8") for w in words]
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return cls(hashes[order], np.array(ids, dtype=np.uint32)[order],
+                   np.array([frequencies[w] for w in words], dtype=np.int64),
+                   offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                   max(map(len, words), default=0), max_distance)
+
+    def save(self, index_dir, signature):
+        os.makedirs(index_dir, exist_ok=True)
+        for name in self.FILES:
+            tmp = os.path.join(index_dir, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, os.path.join(index_dir, f"{name}.npy"))
+        # meta.json en dernier : l'index n'est valide qu'une fois tous les tableaux écrits
+        tmp = os.path.join(index_dir, f"meta.{os.getpid()}.tmp.json")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "longest": self.longest}, f)
+        os.replace(tmp, os.path.join(index_dir, "meta.json"))
+
+    @classmethod
+    def load(cls, index_dir=SPELL_INDEX_DIR, lexique_path=SPELL_LEXIQUE_PATH, max_distance=SPELL_MAX_DISTANCE):
+        """Ouvre l'index persisté (mmap) s'il est à jour, sinon le construit et l'écrit"""
+        signature = index_signature(lexique_path, max_distance)
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("signature") == signature:
+                arrays = [np.load(os.path.join(index_dir, f"{n}.npy"), mmap_mode="r") for n in cls.FILES]
+                return cls(*arrays, longest=meta["longest"], max_distance=max_distance)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        print(f"🧱 Construction de l'index orthographique : {index_dir}")
+        index = cls.build(french_frequencies(lexique_path), max_distance)
+        try:
+            index.save(index_dir, signature)
+        except OSError as e:
+            print(f"⚠️ Index orthographique non persisté : {e}")
+        return index
+
+    def word(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def _lookup(self, keys):
+        """Identifiants des mots dont une variante par suppressions a le même haché qu'une des clés"""
+        h = np.fromiter((_hash(k) for k in keys), dtype=np.uint64)
+        lo = np.searchsorted(self.hashes, h, "left")
+        hi = np.searchsorted(self.hashes, h, "right")
+        return {int(i) for a, b in zip(lo, hi) if b > a for i in self.ids[a:b]}
+
+    def _should_check(self, word):
+        # Mêmes exclusions que SpellChecker._check_if_should_check
+        if len(word) == 1 and word in string.punctuation:
+            return False
+        if len(word) > self.longest + 3:
+            return False
+        if word.lower() in ("nan", "inf", "infinity"):
+            return True
+        try:
+            float(word)
+            return False
+        except ValueError:
+            return True
+
+    def known(self, word):
+        word = word.lower()
+        return self._should_check(word) and any(self.word(i) == word for i in self._lookup([word]))
+
+    def _nearest(self, word):
+        """{mot: fréquence} des mots connus les plus proches de word (minuscules) : distance 1, sinon 2"""
+        by_distance = {}
+        for i in self._lookup(deletes(word, self.max_distance)):
+            cand = self.word(i)
+            d = osa_distance(word, cand, self.max_distance)
+            if 0 < d <= self.max_distance and self._should_check(cand):
+                by_distance.setdefault(d, {})[cand] = int(self.freqs[i])
+        return by_distance[min(by_distance)] if by_distance else {}
+
+    def candidates(self, word):
+        """Comme SpellChecker.candidates : {word} si connu ou à ignorer, sinon les plus proches (None si aucun)"""
+        if self.known(word) or not self._should_check(word):
+            return {word}
+        return set(self._nearest(word.lower())) or None
+
+    def _correction(self, word):
+        """Équivalent de SpellChecker.correction (mémoïsé par self.correction)"""
+        if self.known(word) or not self._should_check(word):
+            return word
+        freq = self._nearest(word.lower())
+        if not freq:
+            return None
+        word_no_accents = _remove_diacritics(word)
+        accents = [c for c in freq if _remove_diacritics(c) == word_no_accents]
+        # À fréquence égale, l'ordre alphabétique départage (pyspellchecker : ordre d'un set)
+        return max(sorted(accents or freq), key=freq.__getitem__)
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_spell_index(index_dir=None, lexique_path=SPELL_LEXIQUE_PATH):
+    """Index unique du processus (ouvert ou construit au premier appel)"""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = SpellIndex.load(index_dir or SPELL_INDEX_DIR, lexique_path)
+        return _INDEX
@@ -0,0 +1,24 @@
+import re
+
+def trie_regex(words):
+    """
+    Regex en arbre de préfixes pour une liste de mots littéraux.
+    Le coût d'un essai dépend de la longueur du mot et non du nombre de mots ;
+    à position égale, le mot le plus long est préféré.
+    """
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return build(trie)
@@ -1,6 +1,19 @@
-import sys
 import re
+import argparse
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher
+import numpy as np
+
+try:
+    from rapidfuzz.distance import Indel, Levenshtein
+    from rapidfuzz.process import cdist
+except ImportError:  # rapidfuzz absent : bornes par histogrammes de caractères, pas de vote ROVER
+    cdist = Levenshtein = None
+
+# Traceback de align_pairwise (int8)
+DIAG, UP, LEFT = 0, 1, 2
+NEG_INF = -(1 << 60)   # score des cellules hors de la bande
 
 def split_sentences(text):
     # # Simple tokenizer, peut être remplacé par nltk.sent_tokenize
@@ -8,118 +21,345 @@ def split_sentences(text):
     import nltk
     return nltk.sent_tokenize(text, language='french')
 
-def align_pairwise(seq1, seq2, gap_score=-2, match_score=2, mismatch_score=-1, min_ratio=0.8):
-    # Needleman-Wunsch modifié pour phrases/strings
+def similarity_matrix(seq1, seq2, min_ratio=0.8):
+    """match[i, j] = SequenceMatcher(None, seq1[i], seq2[j]).ratio() >= min_ratio, calculé en bloc.
+
+    Le ratio de SequenceMatcher (2·M/T) est majoré par des bornes vectorisées : longueurs,
+    puis similarité Indel de rapidfuzz (2·LCS/T, et M <= LCS) ou, sans rapidfuzz,
+    histogrammes de caractères (quick_ratio). SequenceMatcher ne tranche que les paires
+    qui passent les bornes : le résultat est exactement celui de l'appel par paire.
+    """
+    n, m = len(seq1), len(seq2)
+    match = np.zeros((n, m), dtype=bool)
+    if not n or not m:
+        return match
+    cutoff = min_ratio - 1e-9   # bornes en flottants : on ne doit écarter aucune paire limite
+    len1 = np.array([len(s) for s in seq1])[:, None]
+    len2 = np.array([len(s) for s in seq2])[None, :]
+    total = len1 + len2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        candidates = (total == 0) | (2 * np.minimum(len1, len2) / total >= cutoff)
+    if cdist is not None:
+        # Sans score_cutoff : rapidfuzz le convertit en borne de distance entière et l'arrondi
+        # écarte les paires exactement au seuil. Marge à la précision du float32.
+        candidates &= cdist(seq1, seq2, scorer=Indel.normalized_similarity,
+                            dtype=np.float32, workers=-1) >= min_ratio - 1e-6
+        candidates |= total == 0
+    else:
+        chars = {c: k for k, c in enumerate(sorted(set("".join(seq1)) | set("".join(seq2))))}
+        hist1, hist2 = _char_histograms(seq1, chars), _char_histograms(seq2, chars)
+        for i in np.flatnonzero(candidates.any(axis=1)):
+            js = np.flatnonzero(candidates[i])
+            common = np.minimum(hist1[i], hist2[js]).sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                candidates[i, js] = (total[i, js] == 0) | (2 * common / total[i, js] >= cutoff)
+
+    # Vérification exacte, une colonne à la fois (SequenceMatcher garde l'analyse de seq2[j])
+    matcher = SequenceMatcher(None)
+    for j in np.flatnonzero(candidates.any(axis=0)):
+        matcher.set_seq2(seq2[j])
+        for i in np.flatnonzero(candidates[:, j]):
+            matcher.set_seq1(seq1[i])
+            match[i, j] = matcher.ratio() >= min_ratio
+    return match
+
+def _char_histograms(seq, chars):
+    hist = np.zeros((len(seq), len(chars)), dtype=np.int32)
+    for i, s in enumerate(seq):
+        for c in s:
+            hist[i, chars[c]] += 1
+    return hist
+
+def diagonal_band(n, m, band):
+    """Colonnes [lo, hi] calculées pour chaque ligne 0..n : à au plus `band` de la diagonale i·m/n.
+
+    La bande est élargie si besoin pour qu'un chemin relie toujours (0, 0) à (n, m).
+    """
+    band = max(band, -(-m // max(n, 1)))
+    centers = np.arange(n + 1) * m // max(n, 1)
+    return np.maximum(centers - band, 0), np.minimum(centers + band, m)
+
+def align_pairwise(seq1, seq2, gap_score=-2, match_score=2, mismatch_score=-1, min_ratio=0.8, band=None):
+    # Needleman-Wunsch modifié pour phrases/strings, une ligne de la table à la fois (NumPy)
+    # band : seules les cellules à au plus `band` de la diagonale sont calculées (variantes
+    # d'une même page, l'alignement reste proche de la diagonale)
     n, m = len(seq1), len(seq2)
-    score = [[0] * (m+1) for _ in range(n+1)]
-    path = [[None] * (m+1) for _ in range(n+1)]
-
-    # Init
-    for i in range(1, n+1):
-        score[i][0] = score[i-1][0] + gap_score
-        path[i][0] = (i-1, 0)
-    for j in range(1, m+1):
-        score[0][j] = score[0][j-1] + gap_score
-        path[0][j] = (0, j-1)
-
-    # DP
-    for i in range(1, n+1):
-        for j in range(1, m+1):
-            sim = SequenceMatcher(None, seq1[i-1], seq2[j-1]).ratio()
-            s = match_score if sim >= min_ratio else mismatch_score
-            scores = [
-                (score[i-1][j-1] + s, (i-1, j-1)),   # match/mismatch
-                (score[i-1][j] + gap_score, (i-1, j)), # gap seq2
-                (score[i][j-1] + gap_score, (i, j-1))  # gap seq1
-            ]
-            score[i][j], path[i][j] = max(scores, key=lambda x: x[0])
+    if band is None:
+        lo, hi = np.zeros(n + 1, dtype=np.int64), np.full(n + 1, m, dtype=np.int64)
+        match = similarity_matrix(seq1, seq2, min_ratio)
+        row_match = lambda i, a, b: match[i, a:b]
+    else:
+        lo, hi = diagonal_band(n, m, band)
+        row_match = lambda i, a, b: similarity_matrix(seq1[i:i + 1], seq2[a:b], min_ratio)[0]
+    width = int((hi - lo).max()) + 1
+    # path[i, j - lo[i]] : déplacement retenu pour la cellule (i, j) de la bande
+    path = np.empty((n + 1, width), dtype=np.int8)
+    path[0] = LEFT
+    prev = gap_score * np.arange(hi[0] + 1, dtype=np.int64)
+
+    # DP : score[i][j] = max(diagonale + s, haut + gap, gauche + gap). Les deux premiers termes
+    # sont vectorisés ; la dépendance à gauche devient un maximum cumulé :
+    # score[i][j] = gap·j + max_{lo<=k<=j} (t[k] - gap·k), t = max(diagonale, haut) et t[0] = score[i][0]
+    for i in range(1, n + 1):
+        a, b = int(lo[i]), int(hi[i])
+        cols = np.arange(a, b + 1, dtype=np.int64)
+        # Ligne précédente étendue à [a - 1, b], -inf hors de sa bande
+        above = np.full(b - a + 2, NEG_INF, dtype=np.int64)
+        pa, pb = int(lo[i - 1]), int(hi[i - 1])
+        k0, k1 = max(pa, a - 1), min(pb, b)
+        if k0 <= k1:
+            above[k0 - a + 1:k1 - a + 2] = prev[k0 - pa:k1 - pa + 1]
+        first = 1 if a == 0 else 0   # la colonne 0 n'a que le déplacement vers le haut
+        diag = np.full(b - a + 1, NEG_INF, dtype=np.int64)
+        sub = np.where(row_match(i - 1, a + first - 1, b), match_score, mismatch_score)
+        diag[first:] = above[first:-1] + sub
+        up = above[1:] + gap_score
+        t = np.maximum(diag, up)
+        ramp = gap_score * cols
+        row = ramp + np.maximum.accumulate(t - ramp)
+        left = np.concatenate(([NEG_INF], row[:-1] + gap_score))
+        # À égalité, même préférence que max() sur [diagonale, haut, gauche]
+        path[i, :b - a + 1] = np.where(diag >= np.maximum(up, left), DIAG, np.where(up >= left, UP, LEFT))
+        prev = row
 
     # Traceback
     i, j = n, m
     aligned1, aligned2 = [], []
     while i > 0 or j > 0:
-        pi, pj = path[i][j]
-        if pi == i-1 and pj == j-1:
+        move = path[i, j - lo[i]]
+        if move == DIAG:
             aligned1.append(seq1[i-1])
             aligned2.append(seq2[j-1])
-        elif pi == i-1 and pj == j:
+            i, j = i - 1, j - 1
+        elif move == UP:
             aligned1.append(seq1[i-1])
             aligned2.append('')
+            i -= 1
         else:
             aligned1.append('')
             aligned2.append(seq2[j-1])
-        i, j = pi, pj
+            j -= 1
     return aligned1[::-1], aligned2[::-1]
 
-def vote_column(columns):
+def anchor_pairs(seq1, seq2):
+    """Ancres (i, j) : phrases identiques présentes une seule fois dans chaque séquence.
+
+    On garde la plus longue suite croisant dans le même ordre les deux séquences (patience).
+    """
+    count1, count2 = Counter(seq1), Counter(seq2)
+    pos2 = {s: j for j, s in enumerate(seq2) if count2[s] == 1}
+    pairs = [(i, pos2[s]) for i, s in enumerate(seq1) if s.strip() and count1[s] == 1 and s in pos2]
+    # Plus longue sous-suite croissante des j, en O(k log k)
+    tails, tails_idx, back = [], [], [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        back[k] = tails_idx[pos - 1] if pos else -1
+        if pos == len(tails):
+            tails.append(j)
+            tails_idx.append(k)
+        else:
+            tails[pos], tails_idx[pos] = j, k
+    chain = []
+    k = tails_idx[-1] if tails_idx else -1
+    while k >= 0:
+        chain.append(pairs[k])
+        k = back[k]
+    return chain[::-1]
+
+def align_anchored(seq1, seq2, band=None, **scores):
+    """align_pairwise découpé par les ancres : seuls les segments entre deux ancres sont alignés"""
+    aligned1, aligned2 = [], []
+    i0 = j0 = 0
+    for i, j in anchor_pairs(seq1, seq2) + [(len(seq1), len(seq2))]:
+        a1, a2 = align_pairwise(seq1[i0:i], seq2[j0:j], band=band, **scores)
+        aligned1 += a1
+        aligned2 += a2
+        if i < len(seq1):
+            aligned1.append(seq1[i])
+            aligned2.append(seq2[j])
+        i0, j0 = i + 1, j + 1
+    return aligned1, aligned2
+
+def vote_column(columns, rover=True):
     # columns: liste de versions de la même “phrase” de chaque OCR, gaps = ''
     # Ici: on choisit la version la plus fréquente, ou la moins “bruitée” (peut améliorer)
     texts = [c for c in columns if c and c.strip()]
     if not texts:
         return ''
-    # Variante : ici, le plus long (= moins OCRisé), ou vote par correction orthographique
+    # Variante : ici, le plus long (= moins OCRisé), ou vote par correction orthographique
     # Ici: majorité, ou la version la plus "complète"
-    from collections import Counter
     most_common, count = Counter(texts).most_common(1)[0]
+    # Sans majorité stricte (p. ex. une faute différente par variante) : vote mot à mot
+    if rover and Levenshtein is not None and len(texts) >= 3 and 2 * count <= len(texts):
+        return rover_vote(texts)
     return most_common
 
-def align_multiple(texts):
+def rover_vote(texts):
+    """Vote ROVER mot à mot entre les versions d'une même phrase.
+
+    Le pivot est la version la plus proche des autres (distance de Levenshtein sur les mots).
+    Chaque version y est alignée (opcodes de rapidfuzz) ; à chaque position du pivot, puis
+    entre deux positions (mots insérés), la forme la plus votée l'emporte, le pivot en cas
+    d'égalité. Une position où la majorité n'a pas de mot est supprimée.
+    """
+    tokens = [t.split() for t in texts]
+    dist = [[Levenshtein.distance(a, b) for b in tokens] for a in tokens]
+    pivot = min(range(len(tokens)), key=lambda k: sum(dist[k]))
+    ref = tokens[pivot]
+    slots = [Counter() for _ in ref]                  # votes pour le mot en position i du pivot
+    inserts = [Counter() for _ in range(len(ref) + 1)]  # votes pour les mots insérés avant la position i
+    # Le pivot vote en premier : à égalité, Counter.most_common garde sa forme
+    for k in [pivot] + [k for k in range(len(tokens)) if k != pivot]:
+        words = tokens[k]
+        inserted = [()] * (len(ref) + 1)
+        for op in Levenshtein.opcodes(ref, words):
+            if op.tag == "insert":
+                inserted[op.src_start] = tuple(words[op.dest_start:op.dest_end])
+            elif op.tag == "delete":
+                for i in range(op.src_start, op.src_end):
+                    slots[i][""] += 1
+            else:  # equal / replace : un mot pour un mot
+                for i, j in zip(range(op.src_start, op.src_end), range(op.dest_start, op.dest_end)):
+                    slots[i][words[j]] += 1
+        for i, ins in enumerate(inserted):
+            inserts[i][ins] += 1
+
+    out = []
+    for i in range(len(ref) + 1):
+        out.extend(inserts[i].most_common(1)[0][0])
+        if i < len(ref):
+            word = slots[i].most_common(1)[0][0]
+            if word:
+                out.append(word)
+    return " ".join(out)
+
+class MultipleAlignment:
+    """Alignement multiple progressif des variantes OCR, vote seulement à la fin.
+
+    Le profil est un tableau compact : cols[v, c] = indice dans texts[v] de la phrase de la
+    variante v en colonne c, -1 pour un trou (mémoire en variantes × colonnes). Chaque
+    nouvelle variante est alignée une fois sur le consensus courant du profil, puis ses
+    phrases ajoutées aux colonnes (ou en nouvelles colonnes) sans rien perdre des autres.
+    """
+    def __init__(self, texts):
+        # Les phrases vides ne votent pas et serviraient de trous à align_pairwise
+        self.texts = [[s for s in t if s.strip()] for t in texts]
+        self.cols = np.empty((0, 0), dtype=np.int32)
+
+    def add(self, v, anchored=False, band=None, rover=True):
+        seq = self.texts[v]
+        if not len(self.cols):
+            self.cols = np.arange(len(seq), dtype=np.int32)[None, :]
+            return
+        consensus = self.consensus(rover)
+        if anchored:
+            a1, a2 = align_anchored(consensus, seq, band=band)
+        else:
+            a1, a2 = align_pairwise(consensus, seq, band=band)
+        cols = np.full((len(self.cols) + 1, len(a1)), -1, dtype=np.int32)
+        # Colonnes existantes là où le consensus n'a pas de trou, phrases de la variante ailleurs
+        cols[:-1, [k for k, a in enumerate(a1) if a]] = self.cols
+        cols[-1, [k for k, b in enumerate(a2) if b]] = np.arange(len(seq), dtype=np.int32)
+        self.cols = cols
+
+    def column(self, c):
+        """Candidats de la colonne c, une entrée par variante ajoutée ('' = trou)"""
+        return [self.texts[v][k] if k >= 0 else '' for v, k in enumerate(self.cols[:, c].tolist())]
+
+    def columns(self):
+        return [self.column(c) for c in range(self.cols.shape[1])]
+
+    def consensus(self, rover=True):
+        return [vote_column(cols, rover) for cols in self.columns()]
+
+def align_multiple(texts, anchored=False, band=None, rover=True):
     # textes: liste de listes de phrases
-    aligned = texts[0]
-    for i in range(1, len(texts)):
-        a1, a2 = align_pairwise(aligned, texts[i])
-        # Étendre les alignements sur tous les textes précédents
-        new_aligned = []
-        idx = 0
-        for aa, bb in zip(a1, a2):
-            # Si on a inséré un gap, il faut le rajouter sur tout le consensus aligné précédent
-            if aa == '' and idx < len(aligned):
-                # Insérer un gap dans toutes les séquences précédentes
-                for j in range(len(new_aligned)):
-                    new_aligned[j].append('')
-            elif aa != '':
-                if idx >= len(new_aligned):
-                    # Première fois, crée la colonne
-                    new_aligned.append([aa])
-                else:
-                    new_aligned[idx].append(aa)
-                idx += 1
-        # On n’utilise ici que la colonne majoritaire (vote)
-        aligned = [vote_column(cols) for cols in zip(a1, a2)]
-    return aligned
+    # anchored / band : alignements découpés sur les phrases identiques / limités à une bande
+    # rover : vote mot à mot dans les colonnes sans majorité
+    msa = MultipleAlignment(texts)
+    for i in range(len(texts)):
+        msa.add(i, anchored=anchored, band=band, rover=rover)
+    # Vote final : chaque colonne voit les phrases de toutes les variantes
+    return msa.consensus(rover)
+
+def _min_common(size, ratio):
+    """Plus petit nombre de mots communs k tel que k / max(1, size) > ratio"""
+    k = int(ratio * size)
+    while k / max(1, size) <= ratio:
+        k += 1
+    while k > 0 and (k - 1) / max(1, size) > ratio:
+        k -= 1
+    return k
 
 def remove_substring_duplicates(phrases, min_overlap_ratio=0.7):
-    result = []
-    for i, phr in enumerate(phrases):
-        to_add = True
-        for j in range(len(result)):
-            p = result[j]
+    # Une phrase est un doublon de la première phrase gardée avec laquelle elle partage plus de
+    # min_overlap_ratio de ses mots (ou des mots de celle-ci) ; la plus longue des deux est gardée.
+    # Index inversé avec filtrage par préfixe : si k mots communs sont requis, il y en a au moins
+    # un parmi les |S| - k + 1 mots les plus rares de S. Seules ces phrases candidates sont
+    # comparées, dans l'ordre de la liste : même résultat que la comparaison avec toutes.
+    token_sets = [frozenset(phr.split()) for phr in phrases]
+    df = Counter(w for tokens in token_sets for w in tokens)
+
+    def prefix(tokens):
+        need = _min_common(len(tokens), min_overlap_ratio)
+        if need > len(tokens):
+            return []
+        return sorted(tokens, key=lambda w: (df[w], w))[:len(tokens) - need + 1]
+
+    result, kept = [], []              # kept[j] : mots de result[j]
+    by_token = defaultdict(set)        # mot -> phrases gardées qui le contiennent
+    by_prefix = defaultdict(set)       # mot -> phrases gardées dont il est un mot rare (préfixe)
+
+    def index(j, tokens, op):
+        for w in tokens:
+            op(by_token[w], j)
+        for w in prefix(tokens):
+            op(by_prefix[w], j)
+
+    for phr, set1 in zip(phrases, token_sets):
+        candidates = set()
+        for w in prefix(set1):            # assez de mots communs pour set1
+            candidates |= by_token.get(w, set())
+        for w in set1:                    # assez de mots communs pour la phrase gardée
+            candidates |= by_prefix.get(w, set())
+        for j in sorted(candidates):
+            set2 = kept[j]
             # Overlap de tokens
-            set1 = set(phr.split())
-            set2 = set(p.split())
             intersection = set1 & set2
             overlap1 = len(intersection) / max(1, len(set1))
             overlap2 = len(intersection) / max(1, len(set2))
             if overlap1 > min_overlap_ratio or overlap2 > min_overlap_ratio:
                 # Si la nouvelle phrase est plus longue, on remplace
-                if len(phr) > len(p):
-                    result[j] = phr
-                to_add = False
+                if len(phr) > len(result[j]):
+                    index(j, set2, set.discard)
+                    result[j], kept[j] = phr, set1
+                    index(j, set1, set.add)
                 break
-        if to_add:
+        else:
+            index(len(result), set1, set.add)
             result.append(phr)
+            kept.append(set1)
     return result
 
 def main():
-    files = sys.argv[1:-1]
-    output = sys.argv[-1]
+    parser = argparse.ArgumentParser(description="Vote entre variantes OCR d'une même page, phrase par phrase")
+    parser.add_argument("paths", nargs="+", help="variantes OCR (.txt) puis fichier de sortie")
+    parser.add_argument("--anchored", action="store_true",
+                        help="découpe l'alignement sur les phrases identiques (quasi linéaire)")
+    parser.add_argument("--band", type=int, default=None,
+                        help="ne calcule que les cellules à au plus BAND phrases de la diagonale")
+    args = parser.parse_args()
+    if len(args.paths) < 2:
+        parser.error("au moins une variante et le fichier de sortie sont requis")
+    files = args.paths[:-1]
+    output = args.paths[-1]
     textes = []
     for fname in files:
         with open(fname, encoding="utf-8") as f:
             raw = f.read()
             sentences = [s.strip() for s in split_sentences(raw) if s.strip()]
             textes.append(sentences)
-    result = align_multiple(textes)
+    result = align_multiple(textes, anchored=args.anchored, band=args.band)
     result = remove_substring_duplicates(result, min_overlap_ratio=0.7)
     with open(output, "w", encoding="utf-8") as fout:
         fout.write("\n\n".join([s for s in result if s.strip()]))